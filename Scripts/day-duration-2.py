@@ -5,6 +5,11 @@ import re
 import time
 import random
 from datetime import datetime
+import logging
+from pipeline_logging import setup_logging, log_row
+
+setup_logging(logging.INFO)
+logger = logging.getLogger(__name__)
 
 def scrape_astronomy_data():
     url = "https://www.timeanddate.com/astronomy/usa"
@@ -15,18 +20,18 @@ def scrape_astronomy_data():
     }
     
     try:
-        print(f"Requesting data from {url}...")
+        logger.info(f"Requesting data from {url}...")
         response = requests.get(url, headers=headers)
         response.raise_for_status()
         
-        print(f"Status code: {response.status_code}")
+        logger.info(f"Status code: {response.status_code}")
         
         soup = BeautifulSoup(response.text, 'html.parser')
         
         # Find the table with class "zebra fw tb-sm zebra"
         table = soup.find('table', class_='zebra fw tb-sm zebra')
         if not table:
-            print("Target table not found on the page")
+            logger.error("Target table not found on the page")
             return {}
         
         # Dictionary to store state abbreviation to day duration mapping
@@ -34,7 +39,7 @@ def scrape_astronomy_data():
         
         # Skip the header row and process all other rows
         rows = table.find_all('tr')[1:]
-        print(f"Found {len(rows)} data rows")
+        logger.info(f"Found {len(rows)} data rows")
         
         for row in rows:
             cols = row.find_all('td')
@@ -75,10 +80,10 @@ def scrape_astronomy_data():
                                         state_to_day_duration[state_abbrev] = []
                                     state_to_day_duration[state_abbrev].append((hours, minutes))
                                     
-                                    print(f"Found: {city_state} ({state_abbrev}), Day duration: {day_duration}")
+                                    log_row(logger, "Found: %s (%s), Day duration: %s", city_state, state_abbrev, day_duration)
                                     
                                 except ValueError as e:
-                                    print(f"Error parsing time for {city_state}: {e}")
+                                    logger.warning(f"Error parsing time for {city_state}: {e}")
                 
             # Add a small delay to be respectful
             time.sleep(random.uniform(0.1, 0.3))
@@ -94,42 +99,42 @@ def scrape_astronomy_data():
                 avg_minutes = sum(total_minutes) / len(total_minutes)
                 avg_hours, avg_mins = divmod(round(avg_minutes), 60)
                 state_day_duration_map[state] = f"{avg_hours}h {avg_mins}m"
-                print(f"Average day duration for {state}: {avg_hours}h {avg_mins}m (from {len(durations)} data points)")
+                log_row(logger, "Average day duration for %s: %sh %sm (from %s data points)", state, avg_hours, avg_mins, len(durations))
         
         return state_day_duration_map
     
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching data: {e}")
+        logger.error(f"Error fetching data: {e}")
         return {}
 
 def add_day_duration_to_haunted_places():
     # Load haunted places data
     haunted_places_path = "../Datasets/haunted_places.tsv"
-    print(f"Loading haunted places data from {haunted_places_path}...")
+    logger.info(f"Loading haunted places data from {haunted_places_path}...")
     haunted_places = pd.read_csv(haunted_places_path, sep='\t')
     
     # Scrape astronomy data
     state_day_duration_map = scrape_astronomy_data()
     
     if not state_day_duration_map:
-        print("No astronomy data available. Cannot proceed.")
+        logger.error("No astronomy data available. Cannot proceed.")
         return
     
-    print(f"Found day duration data for {len(state_day_duration_map)} states")
+    logger.info(f"Found day duration data for {len(state_day_duration_map)} states")
     
     # Add day_duration to haunted_places based on state_abbrev
-    print("Adding day duration to haunted places data...")
+    logger.info("Adding day duration to haunted places data...")
     haunted_places['day_duration'] = haunted_places['state_abbrev'].map(state_day_duration_map)
     
     # Save the result to a new TSV file
     output_path = "../Datasets/haunted_places_evidence_day_duration.tsv"
-    print(f"Saving data to {output_path}...")
+    logger.info(f"Saving data to {output_path}...")
     haunted_places.to_csv(output_path, sep='\t', index=False)
     
     mapped_count = sum(haunted_places['day_duration'].notna())
-    print(f"Successfully added day duration for {mapped_count} out of {len(haunted_places)} haunted places.")
-    print(f"Result saved to {output_path}")
+    logger.info(f"Successfully added day duration for {mapped_count} out of {len(haunted_places)} haunted places.")
+    logger.info(f"Result saved to {output_path}")
 
 if __name__ == "__main__":
-    print("Starting to add day duration data to haunted places...")
+    logger.info("Starting to add day duration data to haunted places...")
     add_day_duration_to_haunted_places()
\ No newline at end of file
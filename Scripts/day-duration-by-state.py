@@ -5,9 +5,64 @@ from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime, timedelta
 import urllib.parse
+import argparse
+import json
+import os
+import time
+import numpy as np
+import logging
+from pipeline_logging import setup_logging, log_row, ProgressReporter
+from solar import daylight_hours, load_daylight_table
 
 nest_asyncio.apply()
 
+setup_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Daylight is computed locally by the solar module. USNO is only scraped to validate it,
+# on a sample of grid cells of this many degrees, each looked up once.
+# 0.1 degrees is about 11 km, where daylight differs by well under a minute.
+GRID_DEGREES = 0.1
+
+# Most USNO requests in flight at once
+MAX_CONCURRENT_REQUESTS = 10
+
+# Largest expected difference from USNO; its times are rounded to the minute
+VALIDATION_TOLERANCE_MINUTES = 5
+
+# USNO daylight hours already fetched, keyed by grid cell and date
+DAYLIGHT_CACHE_FILE = os.path.join(os.getcwd(), 'cache', 'daylight_cache.json')
+
+def grid_cell(latitude, longitude, grid=None):
+    """Snap a coordinate to the centre of its grid cell."""
+    grid = grid or GRID_DEGREES
+    return round(round(latitude / grid) * grid, 4), round(round(longitude / grid) * grid, 4)
+
+def cell_key(cell, date):
+    return f"{cell[0]:.4f},{cell[1]:.4f},{date.strftime('%Y-%m-%d')}"
+
+def load_daylight_cache(path=None):
+    path = path or DAYLIGHT_CACHE_FILE
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        logger.info("Loaded %d cached daylight values from %s", len(cache), path)
+        return cache
+    except (OSError, ValueError) as e:
+        logger.error("Error loading daylight cache %s: %s", path, e)
+        return {}
+
+def save_daylight_cache(cache, path=None):
+    path = path or DAYLIGHT_CACHE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+    logger.info("Saved %d daylight values to %s", len(cache), path)
+
 async def fetch_daylight_data(session, latitude, longitude, date):
     base_url = "https://aa.usno.navy.mil/calculated/rstt/oneday"
     params = {
@@ -23,7 +78,7 @@ async def fetch_daylight_data(session, latitude, longitude, date):
     }
     
     full_url = base_url + "?" + urllib.parse.urlencode(params)
-    print(f"Scraping URL: {full_url}")
+    log_row(logger, "Scraping URL: %s", full_url)
 
     try:
         async with session.get(full_url) as response:
@@ -40,15 +95,13 @@ async def fetch_daylight_data(session, latitude, longitude, date):
 
             table = find_table_with_rise_set(soup)
             if not table:
-                print("Could not find results table containing 'Rise' and 'Set'")
+                log_row(logger, "Could not find results table containing 'Rise' and 'Set' at %s", full_url)
                 return None
-            print("Successfully found results table")
 
             rows = table.find_all('tr')
             if len(rows) < 3:
-                print("Could not find enough rows in the table (expected at least 3)")
+                log_row(logger, "Could not find enough rows in the table (expected at least 3) at %s", full_url)
                 return None
-            print("Successfully found enough rows in the table")
 
             sunrise_text = None
             sunset_text = None
@@ -61,15 +114,14 @@ async def fetch_daylight_data(session, latitude, longitude, date):
                     sunset_text = cells[1].text.strip()
 
             if sunrise_text and sunset_text:
-                print(f"Sunrise text: {sunrise_text}, Sunset text: {sunset_text}")
+                log_row(logger, "Sunrise text: %s, Sunset text: %s", sunrise_text, sunset_text)
             else:
-                print("Could not find Rise or Set times in the table")
+                log_row(logger, "Could not find Rise or Set times in the table at %s", full_url)
                 return None
 
             try:
                 sunrise = datetime.strptime(sunrise_text, "%H:%M").time()
                 sunset = datetime.strptime(sunset_text, "%H:%M").time()
-                print("Successfully parsed sunrise and sunset times")
 
                 sunrise_datetime = datetime.combine(date, sunrise)
                 sunset_datetime = datetime.combine(date, sunset)
@@ -79,72 +131,120 @@ async def fetch_daylight_data(session, latitude, longitude, date):
 
                 daylight_duration = sunset_datetime - sunrise_datetime
                 daylight_hours = daylight_duration.total_seconds() / 3600
-                print(f"Daylight duration: {daylight_hours:.2f} hours")
-                print(f"Daylight duration (timedelta): {daylight_duration}")
+                log_row(logger, "Daylight duration: %.2f hours (%s)", daylight_hours, daylight_duration)
                 return daylight_hours
 
             except ValueError:
-                print(f"Could not parse sunrise/sunset times: sunrise='{sunrise_text}', sunset='{sunset_text}'")
+                logger.warning("Could not parse sunrise/sunset times: sunrise='%s', sunset='%s'", sunrise_text, sunset_text)
                 return None
 
     except aiohttp.ClientError as e:
-        print(f"Error scraping {base_url}: {e}")
+        logger.error("Error scraping %s: %s", base_url, e)
         return None
 
-async def main():
-    print("Starting main function")
+async def fetch_limited(semaphore, session, cell, date):
+    """Fetch one grid cell's daylight once a request slot is free."""
+    async with semaphore:
+        return await fetch_daylight_data(session, cell[0], cell[1], date)
+
+async def fetch_usno_cells(keys, date, concurrency=None, cache_file=None):
+    """USNO daylight hours for grid cell keys, fetching each uncached cell once."""
+    concurrency = concurrency or MAX_CONCURRENT_REQUESTS
+    cache = load_daylight_cache(cache_file)
+    missing_keys = [key for key in keys if key not in cache]
+    logger.info("%d of %d grid cells need a USNO lookup", len(missing_keys), len(keys))
+
+    progress = ProgressReporter(logger, len(missing_keys), 'USNO lookups')
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def lookup(key):
+            lat, lon, _ = key.split(',')
+            hours = await fetch_limited(semaphore, session, (float(lat), float(lon)), date)
+            progress.update(**{'missing' if hours is None else 'found': 1})
+            # Failures are left out of the cache so the next run retries them
+            if hours is not None:
+                cache[key] = hours
+            else:
+                log_row(logger, "Could not retrieve daylight data for cell %s", key)
+
+        try:
+            await asyncio.gather(*(lookup(key) for key in missing_keys))
+        finally:
+            progress.close()
+            save_daylight_cache(cache, cache_file)
+
+    return {key: cache[key] for key in keys if key in cache}
+
+async def validate_against_usno(latitudes, longitudes, date, sample_size, grid=None, concurrency=None, cache_file=None):
+    """Compare the local engine with USNO on a random sample of grid cells."""
+    cells = sorted({grid_cell(lat, lon, grid) for lat, lon in zip(latitudes, longitudes)})
+    sample = [cells[i] for i in np.random.default_rng(0).permutation(len(cells))[:sample_size]]
+    usno = await fetch_usno_cells([cell_key(cell, date) for cell in sample], date, concurrency, cache_file)
+
+    compared = [(cell, usno[cell_key(cell, date)]) for cell in sample if cell_key(cell, date) in usno]
+    if not compared:
+        logger.warning("No USNO values to validate against")
+        return
+    lats, lons, usno_hours = (np.array(values) for values in zip(*[(lat, lon, hours) for (lat, lon), hours in compared]))
+    diff_minutes = np.abs(daylight_hours(lats, lons, date) - usno_hours) * 60
+    logger.info("Local engine vs USNO over %d cells: mean difference %.2f min, max %.2f min",
+                len(compared), diff_minutes.mean(), diff_minutes.max())
+    if diff_minutes.max() > VALIDATION_TOLERANCE_MINUTES:
+        worst = compared[int(diff_minutes.argmax())][0]
+        logger.warning("Cell %s differs from USNO by %.1f minutes", worst, diff_minutes.max())
+
+async def main(grid=None, concurrency=None, cache_file=None, validate=0):
+    """Add each row's average daylight hours over the year, from the precomputed table.
+
+    With validate, that many grid cells are also checked against USNO.
+    """
+    logger.info("Starting main function")
     haunted_places_file = "../Datasets/haunted_places.tsv"
     try:
         haunted_df = pd.read_csv(haunted_places_file, sep='\t')
-        print(f"Successfully loaded {haunted_places_file}")
+        logger.info("Successfully loaded %s", haunted_places_file)
     except FileNotFoundError:
-        print(f"Error: {haunted_places_file} not found.")
+        logger.error("Error: %s not found.", haunted_places_file)
         return
 
     haunted_df['latitude'] = pd.to_numeric(haunted_df['latitude'], errors='coerce')
     haunted_df['longitude'] = pd.to_numeric(haunted_df['longitude'], errors='coerce')
-    print("Successfully converted latitude and longitude to numeric")
+    logger.info("Successfully converted latitude and longitude to numeric")
 
-    haunted_df['average_daylight_hours'] = None
     today = datetime.now()
+    valid = (haunted_df['latitude'].notna() & haunted_df['longitude'].notna()).to_numpy()
+    logger.info("Skipping %d rows without valid latitude and longitude", (~valid).sum())
+    latitudes = haunted_df['latitude'].to_numpy()[valid]
+    longitudes = haunted_df['longitude'].to_numpy()[valid]
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for index, row in haunted_df.iterrows():
-            latitude = row['latitude']
-            longitude = row['longitude']
-
-            if pd.isna(latitude) or pd.isna(longitude):
-                print(f"Skipping row {index} due to invalid latitude or longitude")
-                continue
-
-            print(f"Scraping data for latitude: {latitude}, longitude: {longitude}")
-            task = asyncio.ensure_future(fetch_daylight_data(session, latitude, longitude, today))
-            tasks.append(task)
-
-        daylight_hours = await asyncio.gather(*tasks)
-
-    for index, hours in enumerate(daylight_hours):
-        if hours is not None:
-            haunted_df.loc[index, 'average_daylight_hours'] = hours
-            row = haunted_df.iloc[index]
-            latitude = row['latitude']
-            longitude = row['longitude']
-            print(f"Daylight data for {latitude}, {longitude}: {hours:.2f} hours")
-        else:
-            row = haunted_df.iloc[index]
-            latitude = row['latitude']
-            longitude = row['longitude']
-            print(f"Could not retrieve daylight data for {latitude}, longitude: {longitude}")
-            print('---------')
+    # One vectorized lookup for every row; rows without coordinates stay empty
+    start = time.perf_counter()
+    table = load_daylight_table()
+    haunted_df['average_daylight_hours'] = table.annual(haunted_df['latitude'], haunted_df['longitude'])
+    logger.info("Looked up annual daylight hours for %d of %d rows in %.1f ms",
+                valid.sum(), len(haunted_df), (time.perf_counter() - start) * 1000)
+
+    if validate:
+        await validate_against_usno(latitudes, longitudes, today, validate, grid, concurrency, cache_file)
 
     output_file = "../Datasets/haunted_places_evidence_daylight.tsv"
     haunted_df.to_csv(output_file, sep='\t', index=False)
-    print(f"Successfully merged and saved data to {output_file}")
+    logger.info("Successfully merged and saved data to %s", output_file)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add daylight hours to the haunted places dataset")
+    parser.add_argument('--validate', type=int, default=0, metavar='CELLS',
+                        help="also compare this many grid cells against USNO (needs the network)")
+    parser.add_argument('--grid', type=float, default=GRID_DEGREES,
+                        help="degrees of the grid validation samples are drawn from; one USNO lookup per cell")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="most USNO requests in flight at once")
+    parser.add_argument('--cache-file', default=DAYLIGHT_CACHE_FILE, help="JSON cache of fetched USNO daylight hours")
+    args = parser.parse_args()
+
     try:
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(main())
+        loop.run_until_complete(main(args.grid, args.concurrency, args.cache_file, args.validate))
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+        logger.error("An unexpected error occurred: %s", e)
\ No newline at end of file
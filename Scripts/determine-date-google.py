@@ -1,8 +1,10 @@
 import re
 import os
+import argparse
 import json
 import pickle
 import hashlib
+import zlib
 import datefinder
 import pandas as pd
 from datetime import datetime
@@ -12,72 +14,593 @@ import time
 import requests
 from bs4 import BeautifulSoup
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 from urllib.parse import urlparse
 from googlesearch import search as GoogleSearch
 import logging
-from collections import Counter
+from collections import Counter, OrderedDict, deque
 from functools import lru_cache
+from contextlib import contextmanager
+import threading
+import unicodedata
+import shutil
+import tarfile
+import tempfile
+import importlib.util
 
-# Note: To reset or clear the cache, set the reset parameter to True at the bottom of the main script. 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Prefer the much faster lxml parser when it is installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+# Note: To reset or clear the cache, run the script with --reset (the reset parameter of main()).
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from pipeline_logging import setup_logging, log_row, ProgressReporter
+
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Run metrics are written periodically to metrics.json in the cache directory unless
+# another file is given; a .prom suffix selects Prometheus text format
+METRICS_INTERVAL = 30  # seconds between metrics file writes
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]
+
+class RunMetrics:
+    """Thread-safe counters, gauges, stage timers and per-host latency histograms for one run."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+        self.cache_hits = Counter()
+        self.cache_misses = Counter()
+        self.requests = Counter()
+        self.request_errors = Counter()
+        self.circuit_skips = Counter()
+        self.hedges = Counter()
+        self.canonical_hits = Counter()
+        self.latency_buckets = {}
+        self.latency_sum = Counter()
+        self.stage_seconds = Counter()
+        self.rows_by_source = Counter()
+        self.gauges = {}
+    
+    def count_cache(self, name, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits[name] += 1
+            else:
+                self.cache_misses[name] += 1
+    
+    def count_canonical(self, name):
+        with self._lock:
+            self.canonical_hits[name] += 1
+    
+    def count_hedge(self, outcome):
+        with self._lock:
+            self.hedges[outcome] += 1
+    
+    def observe_request(self, host, seconds, ok=True):
+        with self._lock:
+            self.requests[host] += 1
+            if not ok:
+                self.request_errors[host] += 1
+            self.latency_sum[host] += seconds
+            buckets = self.latency_buckets.setdefault(host, [0] * len(LATENCY_BUCKETS))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+                    break
+    
+    def count_circuit_skip(self, host):
+        with self._lock:
+            self.circuit_skips[host] += 1
+    
+    def add_stage_time(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+    
+    @contextmanager
+    def timer(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.time() - start)
+    
+    def count_row(self, source):
+        with self._lock:
+            self.rows_by_source[source or 'not_found'] += 1
+    
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+    
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            elapsed = time.time() - self.start_time
+            rows = sum(self.rows_by_source.values())
+            caches = sorted(set(self.cache_hits) | set(self.cache_misses))
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'rows_processed': rows,
+                'rows_per_second': round(rows / elapsed, 3) if elapsed > 0 else 0.0,
+                'rows_by_source': dict(self.rows_by_source),
+                'caches': {
+                    name: {
+                        'hits': self.cache_hits[name],
+                        'misses': self.cache_misses[name],
+                        'hit_ratio': round(self.cache_hits[name] / max(1, self.cache_hits[name] + self.cache_misses[name]), 4),
+                        'canonical_hits': self.canonical_hits[name]
+                    } for name in caches
+                },
+                'hosts': {
+                    host: {
+                        'requests': self.requests[host],
+                        'errors': self.request_errors[host],
+                        'circuit_skips': self.circuit_skips[host],
+                        'latency_seconds_sum': round(self.latency_sum[host], 3),
+                        'latency_buckets': dict(zip([str(b) for b in LATENCY_BUCKETS], self.latency_buckets.get(host, [0] * len(LATENCY_BUCKETS))))
+                    } for host in sorted(set(self.requests) | set(self.circuit_skips))
+                },
+                'hedges': dict(self.hedges),
+                'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+                'gauges': dict(self.gauges)
+            }
+    
+    def to_prometheus(self):
+        """Render the metrics in Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [
+            '# TYPE date_pipeline_rows_processed_total counter',
+            f"date_pipeline_rows_processed_total {snap['rows_processed']}",
+            '# TYPE date_pipeline_rows_per_second gauge',
+            f"date_pipeline_rows_per_second {snap['rows_per_second']}",
+            '# TYPE date_pipeline_cache_lookups_total counter'
+        ]
+        for name, stats in snap['caches'].items():
+            lines.append(f'date_pipeline_cache_lookups_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+            lines.append(f'date_pipeline_cache_lookups_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+        lines.append('# TYPE date_pipeline_canonical_key_hits_total counter')
+        for name, stats in snap['caches'].items():
+            lines.append(f'date_pipeline_canonical_key_hits_total{{cache="{name}"}} {stats["canonical_hits"]}')
+        lines.append('# TYPE date_pipeline_request_errors_total counter')
+        for host, stats in snap['hosts'].items():
+            lines.append(f'date_pipeline_request_errors_total{{host="{host}"}} {stats["errors"]}')
+        lines.append('# TYPE date_pipeline_circuit_skips_total counter')
+        for host, stats in snap['hosts'].items():
+            lines.append(f'date_pipeline_circuit_skips_total{{host="{host}"}} {stats["circuit_skips"]}')
+        lines.append('# TYPE date_pipeline_request_seconds histogram')
+        for host, stats in snap['hosts'].items():
+            cumulative = 0
+            for bound, count in stats['latency_buckets'].items():
+                cumulative += count
+                le = '+Inf' if bound == 'inf' else bound
+                lines.append(f'date_pipeline_request_seconds_bucket{{host="{host}",le="{le}"}} {cumulative}')
+            lines.append(f'date_pipeline_request_seconds_sum{{host="{host}"}} {stats["latency_seconds_sum"]}')
+            lines.append(f'date_pipeline_request_seconds_count{{host="{host}"}} {stats["requests"]}')
+        lines.append('# TYPE date_pipeline_hedges_total counter')
+        for outcome, count in snap['hedges'].items():
+            lines.append(f'date_pipeline_hedges_total{{outcome="{outcome}"}} {count}')
+        lines.append('# TYPE date_pipeline_stage_seconds_total counter')
+        for stage, seconds in snap['stage_seconds'].items():
+            lines.append(f'date_pipeline_stage_seconds_total{{stage="{stage}"}} {seconds}')
+        for name, value in snap['gauges'].items():
+            lines.append(f'# TYPE date_pipeline_{name} gauge')
+            lines.append(f'date_pipeline_{name} {value}')
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path):
+        """Write the metrics atomically, as Prometheus text for .prom files and JSON otherwise."""
+        if path.endswith('.prom'):
+            payload = self.to_prometheus()
+        else:
+            payload = json.dumps(self.snapshot(), indent=2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    
+    def log_summary(self):
+        """Log an end-of-run summary of where the time went."""
+        snap = self.snapshot()
+        logger.info(f"Run metrics: {snap['rows_processed']} rows in {snap['elapsed_seconds']:.1f}s "
+                    f"({snap['rows_per_second']:.2f} rows/s)")
+        for name, stats in snap['caches'].items():
+            logger.info(f"Cache {name}: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['hit_ratio'] * 100:.1f}% hit ratio), {stats['canonical_hits']} of the hits "
+                        f"on entries stored by another wording of the query")
+        for host, stats in snap['hosts'].items():
+            mean = stats['latency_seconds_sum'] / max(1, stats['requests'])
+            logger.info(f"Host {host}: {stats['requests']} requests, {stats['errors']} errors, "
+                        f"{stats['circuit_skips']} circuit skips, {mean:.2f}s mean latency")
+        if snap['hedges']:
+            logger.info(f"Hedged lookups: {snap['hedges'].get('started', 0)} started, "
+                        f"{snap['hedges'].get('google_won', 0)} won by Google, {snap['hedges'].get('wikipedia_won', 0)} by Wikipedia")
+        for stage, seconds in sorted(snap['stage_seconds'].items(), key=lambda item: -item[1]):
+            logger.info(f"Stage {stage}: {seconds:.1f}s")
+
+metrics = RunMetrics()
+metrics_stop = threading.Event()
+
+def start_metrics_writer(path, interval=None):
+    """Start a daemon thread that writes the metrics file every interval seconds."""
+    interval = interval or METRICS_INTERVAL
+    metrics_stop.clear()
+    
+    def run():
+        while not metrics_stop.wait(interval):
+            try:
+                metrics.write(path)
+            except Exception as e:
+                logger.error(f"Error writing metrics to {path}: {e}")
+    
+    thread = threading.Thread(target=run, name='metrics-writer', daemon=True)
+    thread.start()
+    return thread
+
+def stop_metrics_writer(path):
+    """Stop the writer, write the final metrics and log the summary."""
+    metrics_stop.set()
+    try:
+        metrics.write(path)
+        logger.info(f"Metrics saved to {path}")
+    except Exception as e:
+        logger.error(f"Error writing metrics to {path}: {e}")
+    metrics.log_summary()
+
+def cache_lookup(name, cache, key):
+    """Check a cache for key, counting the hit or miss."""
+    hit = key in cache
+    metrics.count_cache(name, hit)
+    return hit
+
 # Cache directories
 CACHE_DIR = os.path.join(os.getcwd(), 'cache')
-WIKIPEDIA_CACHE_FILE = os.path.join(CACHE_DIR, 'wikipedia_cache.pkl')
-SEARCH_CACHE_FILE = os.path.join(CACHE_DIR, 'search_cache.pkl')
-WEB_CACHE_FILE = os.path.join(CACHE_DIR, 'web_cache.pkl')
-RESULTS_CACHE_FILE = os.path.join(CACHE_DIR, 'results_cache.pkl')
-PROGRESS_FILE = os.path.join(CACHE_DIR, 'progress.json')
 
-# Create cache directory if it doesn't exist
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+def cache_paths(cache_dir):
+    """Return the cache and progress file paths inside a cache directory."""
+    return {
+        'wikipedia': os.path.join(cache_dir, 'wikipedia_cache.pkl'),
+        'search': os.path.join(cache_dir, 'search_cache.pkl'),
+        'web': os.path.join(cache_dir, 'web_cache.pkl'),
+        'results': os.path.join(cache_dir, 'results_cache.pkl'),
+        'progress': os.path.join(cache_dir, 'progress.json'),
+        'http_archive': os.path.join(cache_dir, 'http_archive.jsonl'),
+        'pages': os.path.join(cache_dir, 'pages'),
+        'offline_report': os.path.join(cache_dir, 'offline_misses.tsv')
+    }
+
+def set_cache_dir(cache_dir):
+    """Point the cache and progress files at a cache directory, creating it if needed."""
+    global CACHE_DIR, WIKIPEDIA_CACHE_FILE, SEARCH_CACHE_FILE, WEB_CACHE_FILE, RESULTS_CACHE_FILE, PROGRESS_FILE
+    global HTTP_ARCHIVE_FILE, PAGE_ARCHIVE_DIR, OFFLINE_REPORT_FILE, archive_latest
+    
+    paths = cache_paths(cache_dir)
+    CACHE_DIR = cache_dir
+    WIKIPEDIA_CACHE_FILE = paths['wikipedia']
+    SEARCH_CACHE_FILE = paths['search']
+    WEB_CACHE_FILE = paths['web']
+    RESULTS_CACHE_FILE = paths['results']
+    PROGRESS_FILE = paths['progress']
+    HTTP_ARCHIVE_FILE = paths['http_archive']
+    PAGE_ARCHIVE_DIR = paths['pages']
+    OFFLINE_REPORT_FILE = paths['offline_report']
+    archive_latest = None
+    
+    # Create cache directory if it doesn't exist
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+
+set_cache_dir(CACHE_DIR)
+
+# Shard caches live under the base cache directory
+BASE_CACHE_DIR = CACHE_DIR
+
+# Cache bounds, per cache (None disables a bound)
+CACHE_MAX_ENTRIES = 50000
+CACHE_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+CACHE_MAX_DISK_BYTES = 512 * 1024 * 1024
+
+# Compress cache files with zstd when the zstandard package is installed
+CACHE_COMPRESSION = True
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+class BoundedCache:
+    """Thread-safe dict-like cache with LRU eviction by entry count and approximate size."""
+    
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+    
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            return value
+    
+    def __setitem__(self, key, value):
+        # Size the entry by its pickled form, which is what ends up on disk
+        size = len(key) + len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self.nbytes += size
+            self._evict()
+    
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+            self.nbytes -= self._sizes.pop(key)
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self.nbytes -= self._sizes.pop(key)
+            return self._data.pop(key)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                return self[key]
+            return default
+    
+    def items(self):
+        """Snapshot of (key, value) pairs, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+    
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+    
+    def update(self, entries):
+        for key, value in dict(entries).items():
+            self[key] = value
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+    
+    def _evict(self):
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries) or
+            (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            key, _ = self._data.popitem(last=False)
+            self.nbytes -= self._sizes.pop(key)
+
+def new_cache():
+    """Create an empty cache with the configured bounds."""
+    return BoundedCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_MEMORY_BYTES)
+
+def read_cache_file(path):
+    """Load a cache file, transparently handling zstd-compressed and plain pickles."""
+    with open(path, 'rb') as f:
+        payload = f.read()
+    if payload[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but the zstandard package is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    return pickle.loads(payload)
+
+def encode_cache(entries):
+    """Pickle cache entries, compressing them if enabled."""
+    payload = pickle.dumps(entries, pickle.HIGHEST_PROTOCOL)
+    if CACHE_COMPRESSION and zstandard is not None:
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    return payload
+
+def write_cache_file(path, cache, bounded=True):
+    """Write a cache to disk atomically, dropping least recently used entries past the disk bound.
+    
+    The results cache is the pipeline's output, so it is written unbounded.
+    """
+    items = cache.items() if isinstance(cache, BoundedCache) else list(cache.items())
+    payload = encode_cache(dict(items))
+    
+    # Trim the oldest 10% at a time until the file fits
+    while bounded and CACHE_MAX_DISK_BYTES is not None and len(payload) > CACHE_MAX_DISK_BYTES and items:
+        items = items[max(1, len(items) // 10):]
+        payload = encode_cache(dict(items))
+    
+    # Unique temp name, since workers and the main thread can save concurrently
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return len(items)
+
+# Raw fetched pages (web HTML and Wikipedia wikitext) are kept in a content-addressed
+# archive under cache/pages, so extraction can be re-run without refetching anything.
+# Blobs are named by the SHA-256 of their text; index.jsonl maps each source to its blob.
+PAGE_ARCHIVE_ENABLED = True
+page_archive_lock = threading.Lock()
+# (kind, key) -> latest archived hash or alias target, read from the index on first use
+archive_latest = None
+
+def compress_text(text):
+    """Compress text with zstd when available, zlib otherwise."""
+    data = text.encode('utf-8')
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+def decompress_text(payload):
+    if payload[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("archived page is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    return zlib.decompress(payload).decode('utf-8')
+
+def page_blob_path(digest):
+    return os.path.join(PAGE_ARCHIVE_DIR, 'blobs', digest[:2], digest)
+
+def read_archive_index():
+    """All index entries in order, skipping lines cut short by an interrupted run."""
+    index_file = os.path.join(PAGE_ARCHIVE_DIR, 'index.jsonl')
+    if not os.path.exists(index_file):
+        return
+    with open(index_file) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def append_archive_index(entry):
+    """Append an index entry unless the key already points at the same content."""
+    global archive_latest
+    source = (entry['kind'], entry['key'])
+    target = entry.get('hash') or tuple(entry['alias_of'])
+    with page_archive_lock:
+        if archive_latest is None:
+            archive_latest = {(e['kind'], e['key']): e.get('hash') or tuple(e['alias_of'])
+                              for e in read_archive_index()}
+        if archive_latest.get(source) == target:
+            return
+        os.makedirs(PAGE_ARCHIVE_DIR, exist_ok=True)
+        with open(os.path.join(PAGE_ARCHIVE_DIR, 'index.jsonl'), 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        archive_latest[source] = target
+
+def archive_page(kind, key, text):
+    """Store a raw page once per distinct content and record that key fetched it."""
+    if not PAGE_ARCHIVE_ENABLED or not text:
+        return None
+    
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    path = page_blob_path(digest)
+    try:
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(compress_text(text))
+            os.replace(tmp_path, path)
+        append_archive_index({'kind': kind, 'key': key, 'hash': digest, 'chars': len(text), 'archived_at': time.time()})
+    except Exception as e:
+        logger.error(f"Error archiving {kind} page {key}: {e}")
+    return digest
+
+def archive_alias(kind, key, target_kind, target_key):
+    """Record key as fetching the same content as an already archived key."""
+    if not PAGE_ARCHIVE_ENABLED:
+        return
+    try:
+        append_archive_index({'kind': kind, 'key': key, 'alias_of': [target_kind, target_key], 'archived_at': time.time()})
+    except Exception as e:
+        logger.error(f"Error archiving {kind} alias {key}: {e}")
+
+def read_archived_page(path):
+    with open(path, 'rb') as f:
+        return decompress_text(f.read())
+
+def reparse_pages(items):
+    """Parse archived (kind, key, blob path) pages into cache values, in a worker process or inline."""
+    parsed = []
+    for kind, key, path in items:
+        try:
+            text = read_archived_page(path)
+            value = web_page_date(text) if kind == 'web' else compact_wikitext_page(key, text)
+            parsed.append((kind, key, value, None))
+        except Exception as e:
+            parsed.append((kind, key, None, str(e)))
+    return parsed
+
+def archived_pages():
+    """Latest archive entry per (kind, key), with aliases resolved to their target's blob."""
+    entries = {}
+    for entry in read_archive_index():
+        entries[(entry['kind'], entry['key'])] = entry
+    
+    for source, entry in list(entries.items()):
+        if 'alias_of' in entry:
+            target = entries.get(tuple(entry['alias_of']))
+            if target and 'hash' in target:
+                entries[source] = dict(target, key=entry['key'])
+            else:
+                del entries[source]
+    return entries
 
 # Initialize caches
-wikipedia_cache = {}
-search_cache = {}
-web_cache = {}
+# results_cache holds the pipeline's output, so it is never evicted
+wikipedia_cache = new_cache()
+search_cache = new_cache()
+web_cache = new_cache()
 results_cache = {}
-location_date_cache = {}
+location_date_cache = new_cache()
 processed_ids = set()
+# Rows that ran past their deadline, retried after the main pass and on the next run
+timed_out_ids = set()
+# Rows an offline run could not resolve, with the requests each would need
+offline_misses = {}
+
+# Columns of the per-row result DataFrame
+RESULT_COLUMNS = ['id', 'description', 'extracted_date', 'source', 'confidence']
 
 # Load existing caches if available
 def load_cache():
-    global wikipedia_cache, search_cache, web_cache, results_cache, processed_ids
+    global wikipedia_cache, search_cache, web_cache, results_cache, processed_ids, timed_out_ids
     
     try:
         if os.path.exists(WIKIPEDIA_CACHE_FILE):
-            with open(WIKIPEDIA_CACHE_FILE, 'rb') as f:
-                wikipedia_cache = pickle.load(f)
+            wikipedia_cache = new_cache()
+            for key, value in read_cache_file(WIKIPEDIA_CACHE_FILE).items():
+                # Older caches stored whole WikipediaPage objects
+                if isinstance(value, wikipedia.WikipediaPage):
+                    value = compact_wikipedia_page(value)
+                wikipedia_cache[key] = value
             logger.info(f"Loaded {len(wikipedia_cache)} Wikipedia cache entries")
     except Exception as e:
         logger.error(f"Error loading Wikipedia cache: {e}")
     
     try:
         if os.path.exists(SEARCH_CACHE_FILE):
-            with open(SEARCH_CACHE_FILE, 'rb') as f:
-                search_cache = pickle.load(f)
+            search_cache = new_cache()
+            search_cache.update(read_cache_file(SEARCH_CACHE_FILE))
             logger.info(f"Loaded {len(search_cache)} search cache entries")
     except Exception as e:
         logger.error(f"Error loading search cache: {e}")
     
     try:
         if os.path.exists(WEB_CACHE_FILE):
-            with open(WEB_CACHE_FILE, 'rb') as f:
-                web_cache = pickle.load(f)
+            web_cache = new_cache()
+            web_cache.update(read_cache_file(WEB_CACHE_FILE))
             logger.info(f"Loaded {len(web_cache)} web cache entries")
     except Exception as e:
         logger.error(f"Error loading web cache: {e}")
     
     try:
         if os.path.exists(RESULTS_CACHE_FILE):
-            with open(RESULTS_CACHE_FILE, 'rb') as f:
-                results_cache = pickle.load(f)
+            results_cache = read_cache_file(RESULTS_CACHE_FILE)
             logger.info(f"Loaded {len(results_cache)} results cache entries")
     except Exception as e:
         logger.error(f"Error loading results cache: {e}")
@@ -87,59 +610,663 @@ def load_cache():
             with open(PROGRESS_FILE, 'r') as f:
                 progress_data = json.load(f)
                 processed_ids = set(progress_data.get('processed_ids', []))
-            logger.info(f"Loaded progress data with {len(processed_ids)} processed IDs")
+                timed_out_ids = set(progress_data.get('timed_out_ids', [])) - processed_ids
+            logger.info(f"Loaded progress data with {len(processed_ids)} processed IDs and {len(timed_out_ids)} timed-out IDs")
     except Exception as e:
         logger.error(f"Error loading progress data: {e}")
 
 # Save caches periodically
 def save_cache(force=False):
+    with metrics.timer('save_cache'):
+        write_caches(force)
+
+def write_caches(force=False):
     global wikipedia_cache, search_cache, web_cache, results_cache, processed_ids
     
     # Only save every 100 new entries unless forced
     wiki_cache_size = len(wikipedia_cache)
     if force or wiki_cache_size % 100 == 0:
         try:
-            with open(WIKIPEDIA_CACHE_FILE, 'wb') as f:
-                pickle.dump(wikipedia_cache, f)
-            logger.info(f"Saved {wiki_cache_size} Wikipedia cache entries")
+            saved = write_cache_file(WIKIPEDIA_CACHE_FILE, wikipedia_cache)
+            logger.info(f"Saved {saved} Wikipedia cache entries")
         except Exception as e:
             logger.error(f"Error saving Wikipedia cache: {e}")
     
     search_cache_size = len(search_cache)
     if force or search_cache_size % 100 == 0:
         try:
-            with open(SEARCH_CACHE_FILE, 'wb') as f:
-                pickle.dump(search_cache, f)
-            logger.info(f"Saved {search_cache_size} search cache entries")
+            saved = write_cache_file(SEARCH_CACHE_FILE, search_cache)
+            logger.info(f"Saved {saved} search cache entries")
         except Exception as e:
             logger.error(f"Error saving search cache: {e}")
     
     web_cache_size = len(web_cache)
     if force or web_cache_size % 100 == 0:
         try:
-            with open(WEB_CACHE_FILE, 'wb') as f:
-                pickle.dump(web_cache, f)
-            logger.info(f"Saved {web_cache_size} web cache entries")
+            saved = write_cache_file(WEB_CACHE_FILE, web_cache)
+            logger.info(f"Saved {saved} web cache entries")
         except Exception as e:
             logger.error(f"Error saving web cache: {e}")
     
     results_cache_size = len(results_cache)
     if force or results_cache_size % 100 == 0:
         try:
-            with open(RESULTS_CACHE_FILE, 'wb') as f:
-                pickle.dump(results_cache, f)
-            logger.info(f"Saved {results_cache_size} results cache entries")
+            saved = write_cache_file(RESULTS_CACHE_FILE, results_cache, bounded=False)
+            logger.info(f"Saved {saved} results cache entries")
         except Exception as e:
             logger.error(f"Error saving results cache: {e}")
     
     # Always save progress
     try:
         with open(PROGRESS_FILE, 'w') as f:
-            json.dump({'processed_ids': list(processed_ids)}, f)
+            json.dump({'processed_ids': list(processed_ids), 'timed_out_ids': list(timed_out_ids)}, f)
         logger.info(f"Saved progress with {len(processed_ids)} processed IDs")
     except Exception as e:
         logger.error(f"Error saving progress: {e}")
 
+# HTTP transport: 'live' hits the network, 'record' also archives every response,
+# and 'replay' serves archived responses offline with simulated latency and errors
+HTTP_MODE = 'live'
+REPLAY_LATENCY = 0.3  # mean seconds per replayed request
+REPLAY_JITTER = 0.5  # latency varies uniformly by +/- this fraction
+REPLAY_ERROR_RATE = 0.0  # chance a replayed request fails with a connection error
+REPLAY_SEED = 0
+
+http_archive = {}
+http_archive_lock = threading.Lock()
+replay_attempts = Counter()
+
+class ReplayMiss(Exception):
+    """Raised in replay mode for a request that was never recorded."""
+
+class ReplayedError(Exception):
+    """Raised in replay mode for a request whose recorded outcome was an error."""
+    
+    def __init__(self, error_class, message):
+        super().__init__(f"{error_class}: {message}")
+        self.error_class = error_class
+
+def load_http_archive():
+    """Load recorded responses from the base and current cache directories, later records winning."""
+    global http_archive
+    
+    http_archive = {}
+    archive_files = list(dict.fromkeys([cache_paths(BASE_CACHE_DIR)['http_archive'], HTTP_ARCHIVE_FILE]))
+    for archive_file in archive_files:
+        if not os.path.exists(archive_file):
+            continue
+        with open(archive_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    http_archive[(entry['kind'], entry['key'])] = entry
+                except (ValueError, KeyError):
+                    continue
+    logger.info(f"Loaded {len(http_archive)} recorded HTTP responses")
+
+def configure_http(mode='live', latency=None, jitter=None, error_rate=None, seed=None):
+    """Select the HTTP transport and, for replay, its latency and error model."""
+    global HTTP_MODE, REPLAY_LATENCY, REPLAY_JITTER, REPLAY_ERROR_RATE, REPLAY_SEED
+    
+    HTTP_MODE = mode
+    if latency is not None:
+        REPLAY_LATENCY = latency
+    if jitter is not None:
+        REPLAY_JITTER = jitter
+    if error_rate is not None:
+        REPLAY_ERROR_RATE = error_rate
+    if seed is not None:
+        REPLAY_SEED = seed
+    
+    logger.info(f"HTTP mode: {mode}")
+
+def archive_response(kind, key, value=None, error=None):
+    """Append one request's outcome to the archive."""
+    entry = {'kind': kind, 'key': key, 'recorded_at': time.time()}
+    if error is not None:
+        entry['error'] = getattr(error, 'error_class', type(error).__name__)
+        entry['message'] = str(error)
+    else:
+        entry['value'] = value
+    
+    with http_archive_lock:
+        http_archive[(kind, key)] = entry
+        with open(HTTP_ARCHIVE_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+def replay_response(kind, key):
+    """Serve a recorded response after a simulated delay, possibly injecting an error."""
+    with http_archive_lock:
+        replay_attempts[(kind, key)] += 1
+        attempt = replay_attempts[(kind, key)]
+    
+    # Seed per request and attempt so runs are repeatable but retries can recover
+    rng = random.Random(f"{REPLAY_SEED}:{kind}:{key}:{attempt}")
+    time.sleep(REPLAY_LATENCY * rng.uniform(1 - REPLAY_JITTER, 1 + REPLAY_JITTER))
+    
+    if rng.random() < REPLAY_ERROR_RATE:
+        raise requests.exceptions.ConnectionError(f"Injected replay error for {kind} '{key}'")
+    
+    entry = http_archive.get((kind, key))
+    if entry is None:
+        raise ReplayMiss(f"No recorded response for {kind} '{key}'")
+    if 'error' in entry:
+        raise ReplayedError(entry['error'], entry['message'])
+    return entry['value']
+
+# Hosts behind the non-URL request kinds
+REQUEST_HOSTS = {
+    'google_search': 'www.google.com'
+}
+
+def request_host(kind, key):
+    """Host a request goes to, for per-host limits and metrics."""
+    if kind.startswith('wikipedia'):
+        return urlparse(WIKIPEDIA_API_URL).netloc
+    return REQUEST_HOSTS.get(kind) or urlparse(key).netloc or kind
+
+# Adaptive per-host concurrency: (initial, maximum) requests in flight
+HOST_CONCURRENCY = {
+    'www.google.com': (1, 2),
+    'en.wikipedia.org': (2, 8)
+}
+DEFAULT_HOST_CONCURRENCY = (2, 4)
+
+# Responses slower than this count as congestion and halve the host's limit
+HOST_LATENCY_TARGET = 5.0
+
+# Consecutive timeouts/rate limits that open a host's circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+BREAKER_MAX_COOLDOWN = 15 * 60
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a host's circuit breaker is open."""
+
+class NetworkDisabledError(CircuitOpenError):
+    """A request was needed while the network is disabled.
+    
+    Handled like an open circuit: the lookup is skipped and the row deferred, not cached as a miss.
+    """
+
+# False for offline and re-extract runs, which resolve rows from the caches alone
+NETWORK_ENABLED = True
+
+class HostLimiter:
+    """AIMD concurrency limit plus circuit breaker for one upstream host.
+    
+    Successes grow the limit by about one per limit's worth of requests; rate limits,
+    timeouts and slow responses halve it. After BREAKER_FAILURE_THRESHOLD consecutive
+    rate limits or timeouts the circuit opens and requests fail fast. Once the cooldown
+    passes a single probe is let through, closing the circuit on success or reopening
+    it with a doubled cooldown on failure.
+    """
+    
+    def __init__(self, host, initial, maximum):
+        self.host = host
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.in_flight = 0
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.probing = False
+        self._cond = threading.Condition()
+    
+    def is_open(self):
+        with self._cond:
+            return self.state == 'open' and time.time() - self.opened_at < self.cooldown
+    
+    def acquire(self):
+        """Wait for a request slot, raising CircuitOpenError if the host is open-circuited.
+        
+        Raises RowTimeout if the calling row runs out of time while waiting.
+        """
+        with self._cond:
+            while True:
+                check_deadline()
+                if self.state == 'open':
+                    if time.time() - self.opened_at < self.cooldown:
+                        raise CircuitOpenError(f"Circuit open for {self.host}")
+                    self.state = 'half_open'
+                    self.probing = False
+                
+                if self.state == 'half_open':
+                    if self.probing:
+                        raise CircuitOpenError(f"Circuit half-open for {self.host}, probe in flight")
+                    self.probing = True
+                    self.in_flight += 1
+                    return
+                
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                
+                # Wake by the row's deadline; a watchdog cancel is seen within a second
+                deadline, _ = row_deadline()
+                wait = 1.0 if deadline is None else min(1.0, max(0.0, deadline - time.time()))
+                self._cond.wait(timeout=wait)
+    
+    def release(self, seconds, failure=None):
+        """Return a slot and adapt the limit and breaker to the request's outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            throttled = failure in ('rate_limited', 'timeout')
+            
+            if throttled or seconds > HOST_LATENCY_TARGET:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            
+            if throttled:
+                self.failures += 1
+                if self.state == 'half_open' or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                    if self.state == 'half_open':
+                        self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                    self.state = 'open'
+                    self.opened_at = time.time()
+                    self.probing = False
+                    logger.warning(f"Circuit opened for {self.host} for {self.cooldown}s after {failure}")
+            else:
+                self.failures = 0
+                if self.state == 'half_open':
+                    self.state = 'closed'
+                    self.cooldown = BREAKER_COOLDOWN
+                    self.probing = False
+                    logger.info(f"Circuit closed for {self.host}")
+            
+            self._cond.notify_all()
+    
+    def abandon(self):
+        """Return the slot of a cancelled request, leaving the limit and breaker as they were."""
+        with self._cond:
+            self.in_flight -= 1
+            if self.state == 'half_open':
+                # The probe never finished, so let the next request probe instead
+                self.probing = False
+            self._cond.notify_all()
+
+host_limiters = {}
+host_limiters_lock = threading.Lock()
+
+def get_host_limiter(host):
+    with host_limiters_lock:
+        if host not in host_limiters:
+            initial, maximum = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            host_limiters[host] = HostLimiter(host, initial, maximum)
+        return host_limiters[host]
+
+# Per-thread record of lookups skipped because a circuit was open or failed transiently
+lookup_state = threading.local()
+
+def reset_circuit_skips():
+    lookup_state.circuit_skipped = False
+
+def mark_circuit_skipped():
+    lookup_state.circuit_skipped = True
+
+def circuit_skipped():
+    """Whether a lookup on this thread was skipped, or failed transiently, since the last reset."""
+    return getattr(lookup_state, 'circuit_skipped', False)
+
+def note_network_need(kind, key):
+    """Remember a request this thread's row needed while the network was disabled."""
+    if not hasattr(lookup_state, 'network_needs'):
+        lookup_state.network_needs = []
+    lookup_state.network_needs.append((kind, key))
+
+def take_network_needs():
+    """Requests noted on this thread since the last call, clearing them."""
+    needs = getattr(lookup_state, 'network_needs', [])
+    lookup_state.network_needs = []
+    return needs
+
+# Seconds a row may spend on network lookups, and how much longer rows get on their retry pass
+ROW_DEADLINE = 120
+RETRY_DEADLINE_FACTOR = 3
+
+# Seconds between watchdog checks for rows past their deadline
+WATCHDOG_INTERVAL = 5
+
+class RowTimeout(BaseException):
+    """A row ran past its deadline or was cancelled by the watchdog.
+    
+    Derives from BaseException, like cancellation errors, so the lookups' broad
+    `except Exception` handlers let it through instead of caching it as a failure.
+    """
+
+def start_row_deadline(seconds, cancel):
+    """Give this thread's current row a deadline and a cancel event to check cooperatively."""
+    lookup_state.deadline = time.time() + seconds
+    lookup_state.cancel = cancel
+
+def clear_row_deadline():
+    lookup_state.deadline = None
+    lookup_state.cancel = None
+
+def row_deadline():
+    """The (deadline, cancel event) of this thread's row, or (None, None)."""
+    return getattr(lookup_state, 'deadline', None), getattr(lookup_state, 'cancel', None)
+
+def check_deadline():
+    """Raise RowTimeout if this thread's row is out of time or was cancelled."""
+    deadline, cancel = row_deadline()
+    if (cancel is not None and cancel.is_set()) or (deadline is not None and time.time() > deadline):
+        raise RowTimeout()
+
+def request_timeout(default):
+    """A request timeout no longer than the time left on this thread's row."""
+    deadline, _ = row_deadline()
+    if deadline is None:
+        return default
+    return max(1.0, min(default, deadline - time.time()))
+
+def bind_row_deadline(fn):
+    """Wrap fn so it runs under the calling thread's row deadline on another thread."""
+    deadline, cancel = row_deadline()
+    
+    def run(*args, **kwargs):
+        lookup_state.deadline, lookup_state.cancel = deadline, cancel
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            clear_row_deadline()
+    return run
+
+class RowWatchdog:
+    """Tracks in-flight rows, cancels the ones past their deadline and records them for retry.
+    
+    Threads cannot be killed, so cancellation is cooperative: the row's cancel event is
+    set and the lookups raise RowTimeout at their next check_deadline.
+    """
+    
+    def __init__(self, interval=None):
+        self.interval = interval or WATCHDOG_INTERVAL
+        self._lock = threading.Lock()
+        self._active = {}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='row-watchdog', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def start_row(self, row_id, seconds):
+        cancel = threading.Event()
+        with self._lock:
+            self._active[row_id] = (time.time() + seconds, cancel)
+        start_row_deadline(seconds, cancel)
+    
+    def finish_row(self, row_id, timed_out=False):
+        clear_row_deadline()
+        with self._lock:
+            self._active.pop(row_id, None)
+            if timed_out:
+                timed_out_ids.add(row_id)
+            else:
+                timed_out_ids.discard(row_id)
+            metrics.set_gauge('rows_timed_out', len(timed_out_ids))
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            with self._lock:
+                overdue = [(row_id, cancel) for row_id, (deadline, cancel) in self._active.items()
+                           if now > deadline and not cancel.is_set()]
+                for row_id, cancel in overdue:
+                    # Record it now, so it is retried even if the run dies while it is stuck
+                    cancel.set()
+                    timed_out_ids.add(row_id)
+                metrics.set_gauge('rows_in_flight', len(self._active))
+            for row_id, _ in overdue:
+                logger.warning(f"ID {row_id} passed its deadline; cancelling it for a retry pass")
+
+watchdog = RowWatchdog()
+
+# Parsing and date extraction run in worker processes so they scale across cores,
+# while fetches stay on the I/O threads. Without a pool everything runs inline.
+CPU_WORKERS = os.cpu_count() or 1
+cpu_pool = None
+cpu_pool_lock = threading.Lock()
+
+# Rows or archived pages sent to a worker process at a time
+CPU_CHUNK_SIZE = 250
+
+# Seconds an I/O thread waits on a worker process between deadline checks
+CPU_POLL_INTERVAL = 1.0
+
+def init_cpu_worker(places):
+    """Give a worker process the gazetteer the parent built."""
+    global gazetteer
+    gazetteer = places
+
+def start_cpu_pool(workers):
+    """Start the parsing process pool; 0 or 1 workers keeps parsing inline."""
+    global cpu_pool
+    
+    stop_cpu_pool()
+    if workers and workers > 1:
+        # Spawned, not forked, so workers do not inherit the I/O threads and locks
+        cpu_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_cpu_worker, initargs=(gazetteer,))
+        logger.info(f"Parsing in {workers} worker processes")
+
+def stop_cpu_pool():
+    global cpu_pool
+    
+    if cpu_pool is not None:
+        cpu_pool.shutdown(cancel_futures=True)
+        cpu_pool = None
+
+def run_cpu(fn, *args):
+    """Run fn in a worker process while this thread waits, honoring the row deadline."""
+    pool = cpu_pool
+    if pool is None:
+        return fn(*args)
+    
+    try:
+        future = pool.submit(fn, *args)
+        while True:
+            try:
+                return future.result(timeout=CPU_POLL_INTERVAL)
+            except FuturesTimeoutError:
+                try:
+                    check_deadline()
+                except RowTimeout:
+                    future.cancel()
+                    raise
+    except BrokenProcessPool:
+        # A crashed worker is not the page's fault: parse it here and stop using the pool
+        abandon_cpu_pool(pool)
+        return fn(*args)
+    except RuntimeError as e:
+        # The pool was shut down while this thread waited
+        if 'shutdown' not in str(e):
+            raise
+        return fn(*args)
+
+def abandon_cpu_pool(pool):
+    """Switch to inline parsing for the rest of the run after a worker process crashed."""
+    global cpu_pool
+    
+    with cpu_pool_lock:
+        if cpu_pool is not pool:
+            return
+        cpu_pool = None
+    logger.warning("A parsing worker process crashed; parsing inline for the rest of the run")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def cpu_map(fn, items):
+    """Map fn over items in the worker processes, in order, or inline without a pool."""
+    pool = cpu_pool
+    # A single chunk is not worth the round trip
+    if pool is None or len(items) <= 1:
+        return list(map(fn, items))
+    try:
+        return list(pool.map(fn, items))
+    except BrokenProcessPool:
+        # fn is pure, so the whole batch is simply redone inline
+        abandon_cpu_pool(pool)
+        return list(map(fn, items))
+
+def chunked(items, size=None):
+    size = size or CPU_CHUNK_SIZE
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def http_call(kind, key, fetch, delay=None):
+    """Run one network request through the host's limiter and the configured transport.
+    
+    fetch performs the live request and must return a JSON-serializable value. delay is
+    an optional (low, high) politeness pause taken once a request slot is granted.
+    Raises CircuitOpenError without sending anything while the host is open-circuited.
+    """
+    check_deadline()
+    host = request_host(kind, key)
+    if not NETWORK_ENABLED:
+        mark_circuit_skipped()
+        note_network_need(kind, key)
+        metrics.count_circuit_skip(host)
+        raise NetworkDisabledError(f"network disabled, {kind} request for {key} skipped")
+    limiter = get_host_limiter(host)
+    
+    try:
+        limiter.acquire()
+    except CircuitOpenError:
+        mark_circuit_skipped()
+        metrics.count_circuit_skip(host)
+        raise
+    
+    start = time.time()
+    try:
+        if delay:
+            polite_sleep(*delay)
+            check_deadline()
+            start = time.time()
+        value = transport_call(kind, key, fetch)
+    except RowTimeout:
+        limiter.abandon()
+        raise
+    except Exception as e:
+        elapsed = time.time() - start
+        limiter.release(elapsed, classify_failure(e))
+        metrics.observe_request(host, elapsed, ok=False)
+        raise
+    
+    elapsed = time.time() - start
+    limiter.release(elapsed)
+    metrics.observe_request(host, elapsed)
+    return value
+
+def transport_call(kind, key, fetch):
+    """Dispatch a request to the live, record or replay transport."""
+    if HTTP_MODE == 'replay':
+        return replay_response(kind, key)
+    
+    if HTTP_MODE == 'record':
+        try:
+            value = fetch()
+        except Exception as e:
+            archive_response(kind, key, error=e)
+            raise
+        archive_response(kind, key, value=value)
+        return value
+    
+    return fetch()
+
+def polite_sleep(low, high):
+    """Delay between live requests to avoid being blocked; replay models its own latency."""
+    if HTTP_MODE != 'replay':
+        time.sleep(random.uniform(low, high))
+
+# How long a failed lookup stays cached, by failure class, before it is retried
+NEGATIVE_CACHE_TTL = {
+    'not_found': 30 * 24 * 3600,
+    'disambiguation': 30 * 24 * 3600,
+    'parse_error': 7 * 24 * 3600,
+    'other': 24 * 3600,
+    'timeout': 3600,
+    'rate_limited': 15 * 60
+}
+
+# Failure classes that say nothing about the lookup itself, so rows hitting them are retried
+TRANSIENT_FAILURES = ('timeout', 'rate_limited')
+
+def classify_failure(error):
+    """Map a lookup exception to a negative cache failure class."""
+    # Replayed errors carry the class name of the recorded exception
+    name = getattr(error, 'error_class', type(error).__name__)
+    message = str(error).lower()
+    
+    status = None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        status = response.status_code
+    elif name == 'HTTPError':
+        match = re.search(r'\b([45]\d\d)\b', message)
+        status = int(match.group(1)) if match else None
+    
+    if name == 'DisambiguationError':
+        return 'disambiguation'
+    if name == 'PageError' or status in (404, 410):
+        return 'not_found'
+    if status in (429, 503) or 'too many requests' in message:
+        return 'rate_limited'
+    if 'timeout' in name.lower() or 'timed out' in message or name == 'ConnectionError':
+        return 'timeout'
+    if isinstance(error, MediaWikiPageError):
+        return error.failure
+    if isinstance(error, (ValueError, AttributeError, UnicodeError)):
+        return 'parse_error'
+    return 'other'
+
+def negative_entry(error, failure=None):
+    """Cache entry recording a failed lookup and when it failed.
+    
+    A transient failure defers the row like an open circuit, so it is retried once the
+    entry expires instead of being finalized without a date.
+    """
+    failure = failure or classify_failure(error)
+    if failure in TRANSIENT_FAILURES:
+        mark_circuit_skipped()
+    return {
+        'failure': failure,
+        'message': str(error)[:200],
+        'cached_at': time.time()
+    }
+
+def is_negative(value):
+    return isinstance(value, dict) and 'failure' in value
+
+def cache_get(name, cache, key, empty=None):
+    """Look up key, returning (hit, value).
+    
+    Live negative entries are hits that return empty; expired ones are dropped and
+    count as misses so the lookup is retried.
+    """
+    if key not in cache:
+        metrics.count_cache(name, False)
+        return False, None
+    
+    value = cache.get(key)
+    if is_negative(value):
+        ttl = NEGATIVE_CACHE_TTL.get(value['failure'], NEGATIVE_CACHE_TTL['other'])
+        if time.time() - value['cached_at'] > ttl:
+            cache.pop(key, None)
+            metrics.count_cache(name, False)
+            return False, None
+        if value['failure'] in TRANSIENT_FAILURES:
+            mark_circuit_skipped()
+        metrics.count_cache(name, True)
+        return True, empty
+    
+    metrics.count_cache(name, True)
+    return True, value
+
 # User agents to rotate for web requests
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -160,6 +1287,126 @@ def get_cache_key(text):
     """Generate a stable cache key for any text."""
     return hashlib.md5(text.encode()).hexdigest()
 
+# US state abbreviations, spelled out in query keys
+US_STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas', 'ca': 'california',
+    'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware', 'fl': 'florida', 'ga': 'georgia',
+    'hi': 'hawaii', 'id': 'idaho', 'il': 'illinois', 'in': 'indiana', 'ia': 'iowa',
+    'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana', 'me': 'maine', 'md': 'maryland',
+    'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota', 'ms': 'mississippi', 'mo': 'missouri',
+    'mt': 'montana', 'ne': 'nebraska', 'nv': 'nevada', 'nh': 'new hampshire', 'nj': 'new jersey',
+    'nm': 'new mexico', 'ny': 'new york', 'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio',
+    'ok': 'oklahoma', 'or': 'oregon', 'pa': 'pennsylvania', 'ri': 'rhode island', 'sc': 'south carolina',
+    'sd': 'south dakota', 'tn': 'tennessee', 'tx': 'texas', 'ut': 'utah', 'vt': 'vermont',
+    'va': 'virginia', 'wa': 'washington', 'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming',
+    'dc': 'district of columbia'
+}
+COUNTRY_SUFFIXES = ['united states of america', 'united states', 'usa', 'us']
+
+# Spelling variants and abbreviations folded to one form in query keys
+WORD_ALIASES = {
+    'mt': 'mount', 'ft': 'fort', 'sanitarium': 'sanatorium', 'cemetary': 'cemetery',
+    'hwy': 'highway', 'rd': 'road', 'ave': 'avenue', 'blvd': 'boulevard', 'hosp': 'hospital',
+    'theatre': 'theater'
+}
+
+# Whole names known to be the same place, canonical text to canonical text
+LOCATION_ALIASES = {}
+
+def load_location_aliases(path):
+    """Load tab-separated 'alias<TAB>name' lines into LOCATION_ALIASES."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) == 2 and parts[0].strip() and parts[1].strip():
+                LOCATION_ALIASES[canonical_query(parts[0])] = canonical_query(parts[1])
+    canonical_query.cache_clear()
+    logger.info(f"Loaded {len(LOCATION_ALIASES)} location aliases from {path}")
+
+# Longest first, so "west virginia" is matched before "virginia"
+PLACE_SUFFIX_NAMES = sorted(set(US_STATES.values()) | set(COUNTRY_SUFFIXES), key=len, reverse=True)
+
+def normalize_place_suffix(part):
+    """Spell out a leading state and drop a leading country in a comma-separated part of a query.
+    
+    Abbreviations only count as the whole part, so "in 1890" keeps its "in".
+    """
+    if part in US_STATES:
+        return US_STATES[part]
+    for name in PLACE_SUFFIX_NAMES:
+        if part == name or part.startswith(name + ' '):
+            rest = normalize_place_suffix(part[len(name):].strip())
+            if name in COUNTRY_SUFFIXES:
+                return rest
+            return f"{name} {rest}".strip()
+    return part
+
+@lru_cache(maxsize=100000)
+def canonical_query(text):
+    """Fold case, accents, punctuation, spelling variants, country suffixes and aliases out of a query.
+    
+    A state after a comma is kept, spelled out, since "Springfield, IL" and
+    "Springfield, OH" are different places and a state is a different search;
+    a trailing country ("USA") is dropped.
+    """
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode().lower()
+    text = text.replace('&', ' and ').replace("'", '')
+    
+    parts = []
+    for part in text.split(','):
+        words = re.sub(r'[^\w\s]', ' ', part).split()
+        if not words:
+            continue
+        if not parts:
+            # "St" leads saint names and ends street names
+            if words[0] == 'st':
+                words[0] = 'saint'
+            if words[0] == 'the' and len(words) > 1:
+                words = words[1:]
+        words = ['street' if word == 'st' else WORD_ALIASES.get(word, word) for word in words]
+        parts.append(' '.join(words))
+    
+    if not parts:
+        return ''
+    
+    name = LOCATION_ALIASES.get(parts[0], parts[0])
+    rest = [normalize_place_suffix(part) for part in parts[1:]]
+    rest = [part for part in rest if part]
+    
+    return ' '.join([name] + rest)
+
+# Raw query each canonical key's entry was stored by during this run
+query_forms = {}
+
+def query_key(prefix, query, name=None, cache=None):
+    """Cache key for a query under its canonical form.
+    
+    Given the cache, an entry stored under the query's old raw key is moved to the
+    canonical key. Hits on an entry that another wording of the query stored this run
+    are what canonicalization gained, and are counted under name.
+    """
+    key = get_cache_key(f"{prefix}_{canonical_query(query)}")
+    if cache is None:
+        return key
+    
+    raw_key = get_cache_key(f"{prefix}_{query}")
+    if raw_key != key and key not in cache and raw_key in cache:
+        try:
+            cache[key] = cache.pop(raw_key)
+            query_forms[key] = query
+        except KeyError:
+            pass
+    
+    value = cache.get(key)
+    if key in cache and not (is_negative(value) and negative_expired(value)):
+        stored = query_forms.get(key)
+        if stored is not None and stored != query:
+            metrics.count_canonical(name or prefix)
+    else:
+        # A miss: this lookup stores the entry
+        query_forms[key] = query
+    return key
+
 @lru_cache(maxsize=1000)
 def generate_search_terms(location):
     """Generate various search terms for a location, prioritizing most likely to succeed."""
@@ -234,129 +1481,397 @@ def get_location_with_context(location, description):
     
     return contexts
 
-def try_wikipedia_sections(page):
-    """Try to find dates in specific Wikipedia sections, prioritizing most relevant."""
-    # Prioritized sections for efficiency
-    priority_sections = ['history', 'founding', 'establishment']
-    secondary_sections = ['background', 'early history', 'construction', 'origins']
-    
-    all_dates = []
-    
-    # Try priority sections first
-    for section in priority_sections:
+# Sections read from Wikipedia pages, in priority order
+WIKI_PRIORITY_SECTIONS = ['history', 'founding', 'establishment']
+WIKI_SECONDARY_SECTIONS = ['background', 'early history', 'construction', 'origins']
+
+# Only the start of the article is ever scanned, so only that much is cached
+WIKI_CONTENT_CHARS = 5000
+# Longest text kept per indexed section
+WIKI_SECTION_CHARS = 5000
+
+def compact_wikipedia_page(page):
+    """Reduce a WikipediaPage to the section texts and leading content the pipeline reads."""
+    sections = {}
+    for section in WIKI_PRIORITY_SECTIONS + WIKI_SECONDARY_SECTIONS:
         try:
             section_content = page.section(section)
             if section_content:
-                section_dates = list(datefinder.find_dates(section_content))
-                if section_dates:
-                    all_dates.extend(section_dates)
-                    # Early return if we found dates in high-priority sections
-                    if len(all_dates) > 0:
-                        return all_dates
+                sections[section] = section_content
         except:
             continue
     
+    try:
+        content = page.content[:WIKI_CONTENT_CHARS]
+    except:
+        content = ''
+    
+    return {'title': getattr(page, 'title', None), 'sections': sections, 'content': content, 'dates': {}}
+
+# MediaWiki Action API used for Wikipedia lookups; point it at a local stand-in for testing
+WIKIPEDIA_API_URL = 'https://en.wikipedia.org/w/api.php'
+WIKI_USER_AGENT = 'haunted-places-date-pipeline/1.0 (DSCI 550 HW1)'
+
+# Titles fetched per API request when batching page lookups
+WIKI_TITLES_PER_REQUEST = 20
+
+WIKI_HEADING_PATTERN = re.compile(r'^(={2,6})\s*(.*?)\s*\1\s*$', re.MULTILINE)
+
+class MediaWikiPageError(Exception):
+    """A requested title is missing or is a disambiguation page."""
+    
+    def __init__(self, title, failure):
+        super().__init__(f"{title}: {failure.replace('_', ' ')}")
+        self.failure = failure
+        # Name the error like the wikipedia package does, for classification and replay
+        self.error_class = 'DisambiguationError' if failure == 'disambiguation' else 'PageError'
+
+def wikitext_to_text(wikitext):
+    """Strip wikitext markup down to roughly the plain text Wikipedia renders."""
+    text = re.sub(r'<!--.*?-->', '', wikitext, flags=re.DOTALL)
+    text = re.sub(r'<ref[^>/]*/>', '', text)
+    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.DOTALL)
+    
+    # Remove templates and tables from the innermost out
+    previous = None
+    while previous != text:
+        previous = text
+        text = re.sub(r'\{\{[^{}]*\}\}', '', text)
+        text = re.sub(r'\{\|[^{}]*?\|\}', '', text, flags=re.DOTALL)
+    
+    text = re.sub(r'\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]', r'\1', text)
+    text = re.sub(r'\[https?://\S+\s*([^\]]*)\]', r'\1', text)
+    text = re.sub(r"'{2,}", '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+def compact_wikitext_page(title, wikitext):
+    """Parse a page's wikitext once into the compact entry with a heading-to-text index."""
+    text = wikitext_to_text(wikitext)
+    
+    # Split into the lead and (heading, body) sections
+    headings = list(WIKI_HEADING_PATTERN.finditer(text))
+    lead = text[:headings[0].start()].strip() if headings else text
+    parts = [lead]
+    
+    # Index every heading by lowercased name, keeping the first of any repeats
+    sections = {}
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        name = heading.group(2)
+        body = text[heading.end():end].strip()
+        parts.append(f"== {name} ==\n{body}")
+        
+        if body and name.lower() not in sections:
+            sections[name.lower()] = body[:WIKI_SECTION_CHARS]
+    
+    content = '\n\n'.join(parts)[:WIKI_CONTENT_CHARS]
+    return {'title': title, 'sections': sections, 'content': content, 'dates': {}}
+
+class MediaWikiClient:
+    """Minimal MediaWiki Action API client that batches page content fetches.
+    
+    A search returns its top pages' content in the same round trip, and up to
+    WIKI_TITLES_PER_REQUEST titles are fetched per request, following redirects.
+    """
+    
+    def __init__(self, api_url=None, session=None):
+        self.api_url = api_url or WIKIPEDIA_API_URL
+        self.session = session or requests.Session()
+        self.session.headers.update({'User-Agent': WIKI_USER_AGENT})
+    
+    def _query(self, params):
+        """Run a query, following prop continuations and merging the pages they return.
+        
+        Generator continuations (gsroffset) are not followed: they page on through the
+        rest of the search hits, while a search only wants its first gsrlimit of them.
+        """
+        params = dict(params, action='query', format='json', formatversion=2)
+        query = {'pages': [], 'redirects': [], 'normalized': []}
+        pages = {}
+        
+        while True:
+            check_deadline()
+            response = self.session.get(self.api_url, params=params, timeout=request_timeout(10))
+            response.raise_for_status()
+            data = response.json()
+            if 'error' in data:
+                raise RuntimeError(f"MediaWiki API error: {data['error'].get('info', data['error'])}")
+            
+            batch = data.get('query', {})
+            for key in ('redirects', 'normalized'):
+                query[key].extend(batch.get(key, []))
+            # Continued batches repeat a page with the props it still lacked
+            for page in batch.get('pages', []):
+                pages.setdefault(page.get('title'), {}).update(page)
+            
+            # Only prop continuations (such as rvcontinue) fill in more of this batch's pages
+            continuation = {key: value for key, value in data.get('continue', {}).items()
+                            if not key.startswith('gsr')}
+            if set(continuation) <= {'continue'}:
+                query['pages'] = list(pages.values())
+                return query
+            params.update(continuation)
+    
+    def _read_pages(self, query):
+        """Split query pages into raw wikitext and failures, keyed by title."""
+        pages, failures = {}, {}
+        for page in query['pages']:
+            title = page.get('title')
+            if page.get('missing') or page.get('invalid'):
+                failures[title] = 'not_found'
+            elif 'disambiguation' in page.get('pageprops', {}):
+                failures[title] = 'disambiguation'
+            elif page.get('revisions'):
+                revision = page['revisions'][0]
+                pages[title] = revision.get('slots', {}).get('main', {}).get('content', revision.get('content', ''))
+        return pages, failures
+    
+    def search(self, term, limit=1):
+        """Search for a term, returning (titles in rank order, wikitext, failures) in one request."""
+        query = self._query({
+            'generator': 'search',
+            'gsrsearch': term,
+            'gsrlimit': limit,
+            'prop': 'revisions|pageprops',
+            'rvprop': 'content',
+            'rvslots': 'main',
+            'ppprop': 'disambiguation'
+        })
+        ranked = sorted(query['pages'], key=lambda page: page.get('index', 0))
+        pages, failures = self._read_pages(query)
+        return [page['title'] for page in ranked], pages, failures
+    
+    def fetch_pages(self, titles):
+        """Fetch many titles, returning (wikitext, failures, resolved).
+        
+        Wikitext is keyed by final title and failures by requested title; resolved maps
+        requested titles that were normalized or redirected to their final title.
+        """
+        pages, failures, resolved_titles = {}, {}, {}
+        titles = list(dict.fromkeys(titles))
+        
+        for i in range(0, len(titles), WIKI_TITLES_PER_REQUEST):
+            batch = titles[i:i + WIKI_TITLES_PER_REQUEST]
+            query = self._query({
+                'titles': '|'.join(batch),
+                'redirects': 1,
+                'prop': 'revisions|pageprops',
+                'rvprop': 'content',
+                'rvslots': 'main',
+                'ppprop': 'disambiguation'
+            })
+            found, missing = self._read_pages(query)
+            
+            # Map normalized and redirected titles back to what was asked for
+            resolved = {}
+            for step in query['normalized'] + query['redirects']:
+                resolved[step['from']] = step['to']
+            for title in batch:
+                final = title
+                while final in resolved and resolved[final] != final:
+                    final = resolved[final]
+                if final in found:
+                    pages[final] = found[final]
+                    if title != final:
+                        resolved_titles[title] = final
+                else:
+                    failures[title] = missing.get(final, 'not_found')
+        
+        return pages, failures, resolved_titles
+
+wiki_client = MediaWikiClient()
+
+def configure_wikipedia(api_url):
+    """Point Wikipedia lookups at another MediaWiki API, such as a local stand-in."""
+    global WIKIPEDIA_API_URL, wiki_client
+    
+    WIKIPEDIA_API_URL = api_url
+    wiki_client = MediaWikiClient(api_url)
+    logger.info(f"Wikipedia API: {api_url}")
+
+def section_dates(page, name, text):
+    """Candidate dates for one part of a page, found at most once and kept with the page."""
+    # Pages cached before the index existed have no memo yet
+    memo = page.setdefault('dates', {})
+    if name not in memo:
+        try:
+            memo[name] = run_cpu(find_text_dates, text) if text else []
+        except Exception:
+            memo[name] = []
+    return memo[name]
+
+def find_text_dates(text):
+    return list(datefinder.find_dates(text))
+
+def try_wikipedia_sections(page):
+    """Try to find dates in specific Wikipedia sections, prioritizing most relevant."""
+    sections = page.get('sections', {})
+    
+    # Try priority sections first, returning early on the first one with dates
+    for section in WIKI_PRIORITY_SECTIONS:
+        section_found = section_dates(page, section, sections.get(section))
+        if section_found:
+            return list(section_found)
+    
     # If no dates in priority sections, try secondary sections
-    if not all_dates:
-        for section in secondary_sections:
-            try:
-                section_content = page.section(section)
-                if section_content:
-                    section_dates = list(datefinder.find_dates(section_content))
-                    if section_dates:
-                        all_dates.extend(section_dates)
-            except:
-                continue
+    all_dates = []
+    for section in WIKI_SECONDARY_SECTIONS:
+        all_dates.extend(section_dates(page, section, sections.get(section)))
     
     # If still no dates, try the first paragraph which often has founding info
     if not all_dates:
-        try:
-            # Get the first paragraph of content
-            paragraphs = page.content.split('\n\n')
-            if paragraphs:
-                first_paragraph = paragraphs[0]
-                para_dates = list(datefinder.find_dates(first_paragraph))
-                if para_dates:
-                    all_dates.extend(para_dates)
-        except:
-            pass
+        first_paragraph = page['content'].split('\n\n')[0]
+        all_dates = list(section_dates(page, '#first_paragraph', first_paragraph))
     
-    # As a last resort, try the full article
+    # As a last resort, try the start of the article
     if not all_dates:
-        try:
-            all_dates = list(datefinder.find_dates(page.content[:5000]))  # Just scan first 5000 chars for efficiency
-        except:
-            pass
+        all_dates = list(section_dates(page, '#content', page['content'][:WIKI_CONTENT_CHARS]))
     
     return all_dates
 
+def read_wikipedia_response(response):
+    """Archive a response's raw wikitext and parse it into (pages, failures) keyed by requested title.
+    
+    Called once http_call has returned, so parsing neither holds the host's request slot
+    nor counts as request latency. Older recordings hold pages already compacted.
+    """
+    pages = {}
+    for title, page in response['pages'].items():
+        if isinstance(page, str):
+            archive_page('wiki', title, page)
+            page = run_cpu(compact_wikitext_page, title, page)
+        pages[title] = page
+    
+    for title, final in response.get('resolved', {}).items():
+        if final in pages:
+            pages[title] = pages[final]
+            # Re-extraction rebuilds pages under the titles they were requested by
+            archive_alias('wiki', title, 'wiki', final)
+    return pages, response['failures']
+
+def cache_wikipedia_pages(pages, failures):
+    """Store fetched pages and page failures under their page cache keys."""
+    for title, page in pages.items():
+        wikipedia_cache[get_cache_key(f"wikipedia_page_{title}")] = page
+    for title, failure in failures.items():
+        error = MediaWikiPageError(title, failure)
+        wikipedia_cache[get_cache_key(f"wikipedia_page_{title}")] = negative_entry(error, failure)
+
 def search_wikipedia(search_term):
-    """Search Wikipedia for a single term with caching."""
-    cache_key = get_cache_key(f"wikipedia_search_{search_term}")
+    """Search Wikipedia for a single term with caching, caching the top page along the way."""
+    cache_key = query_key('wikipedia_search', search_term, 'wikipedia', wikipedia_cache)
     
     # Check cache
-    if cache_key in wikipedia_cache:
-        return wikipedia_cache[cache_key]
+    hit, cached = cache_get('wikipedia', wikipedia_cache, cache_key, empty=[])
+    if hit:
+        return cached
+    
+    def fetch():
+        titles, pages, failures = wiki_client.search(search_term, limit=1)
+        return {'titles': titles, 'pages': pages, 'failures': failures}
     
     try:
-        # Add a slight delay to avoid being blocked
-        time.sleep(random.uniform(0.2, 0.5))
+        # Search Wikipedia, with a slight delay to avoid being blocked
+        response = http_call('wikipedia_search', search_term, fetch, delay=(0.2, 0.5))
         
-        # Search Wikipedia
-        search_results = wikipedia.search(search_term, results=1)
+        # Older recordings hold just the list of titles
+        if isinstance(response, list):
+            response = {'titles': response, 'pages': {}, 'failures': {}}
+        search_results = response['titles']
         
-        # Cache the results
+        # Cache the results and the pages that came with them
+        cache_wikipedia_pages(*read_wikipedia_response(response))
         wikipedia_cache[cache_key] = search_results
         return search_results
+    except CircuitOpenError:
+        return []
     except Exception as e:
         logger.error(f"Wikipedia search error for '{search_term}': {e}")
-        wikipedia_cache[cache_key] = []
+        wikipedia_cache[cache_key] = negative_entry(e)
         return []
 
 def get_wikipedia_page(title):
-    """Get a Wikipedia page with caching."""
+    """Get a compacted Wikipedia page with caching."""
     cache_key = get_cache_key(f"wikipedia_page_{title}")
     
     # Check cache
-    if cache_key in wikipedia_cache:
-        return wikipedia_cache[cache_key]
+    hit, cached = cache_get('wikipedia', wikipedia_cache, cache_key)
+    if hit:
+        return cached
+    
+    def fetch():
+        pages, failures, resolved = wiki_client.fetch_pages([title])
+        return {'pages': pages, 'failures': failures, 'resolved': resolved}
     
     try:
-        # Add a slight delay to avoid being blocked
-        time.sleep(random.uniform(0.2, 0.5))
+        response = http_call('wikipedia_page', title, fetch, delay=(0.2, 0.5))
         
-        # Get Wikipedia page
-        page = wikipedia.page(title)
+        # Older recordings hold the compacted page itself
+        if 'content' in response:
+            page = response
+        else:
+            # Parse the page, keeping only what try_wikipedia_sections reads
+            pages, failures = read_wikipedia_response(response)
+            if title not in pages:
+                raise MediaWikiPageError(title, failures.get(title, 'not_found'))
+            page = pages[title]
         
         # Cache the page
         wikipedia_cache[cache_key] = page
         return page
+    except CircuitOpenError:
+        return None
     except Exception as e:
         logger.error(f"Wikipedia page error for '{title}': {e}")
-        wikipedia_cache[cache_key] = None
+        wikipedia_cache[cache_key] = negative_entry(e)
         return None
 
+def prefetch_wikipedia_pages(titles):
+    """Fetch uncached pages in batches of WIKI_TITLES_PER_REQUEST titles per request."""
+    missing = [title for title in dict.fromkeys(titles)
+               if get_cache_key(f"wikipedia_page_{title}") not in wikipedia_cache]
+    
+    for i in range(0, len(missing), WIKI_TITLES_PER_REQUEST):
+        batch = missing[i:i + WIKI_TITLES_PER_REQUEST]
+        
+        def fetch():
+            pages, failures, resolved = wiki_client.fetch_pages(batch)
+            return {'pages': pages, 'failures': failures, 'resolved': resolved}
+        
+        try:
+            response = http_call('wikipedia_pages', '|'.join(batch), fetch, delay=(0.2, 0.5))
+            cache_wikipedia_pages(*read_wikipedia_response(response))
+        except CircuitOpenError:
+            return
+        except Exception as e:
+            logger.error(f"Wikipedia batch page error for {len(batch)} titles: {e}")
+    
+    if missing:
+        logger.info(f"Prefetched {len(missing)} Wikipedia pages in {-(-len(missing) // WIKI_TITLES_PER_REQUEST)} requests")
+
 def search_google(query, num_results=3):
     """Search Google for information about a location, with limited results for efficiency."""
-    cache_key = get_cache_key(f"google_search_{query}")
+    cache_key = query_key('google_search', query, 'search', search_cache)
     
     # Check cache
-    if cache_key in search_cache:
-        return search_cache[cache_key]
+    hit, cached = cache_get('search', search_cache, cache_key, empty=[])
+    if hit:
+        return cached
     
     urls = []
     try:
+        # Perform the search with GoogleSearch class, keeping the result URLs
+        def fetch():
+            gs = GoogleSearch()
+            return [result.url for result in gs.search(query, num_results=num_results)]
         # Add a delay to avoid being blocked
-        time.sleep(random.uniform(1.0, 2.0))
-        
-        # Perform the search with GoogleSearch class
-        gs = GoogleSearch()
-        search_results = gs.search(query, num_results=num_results)
+        result_urls = http_call('google_search', f"{query}|{num_results}", fetch, delay=(1.0, 2.0))
         
         # Process the search results
         count = 0
-        for result in search_results:
-            url = result.url  # Get URL from the result object
+        for url in result_urls:
             parsed_url = urlparse(url)
             
             # Skip certain domains that might not be relevant
@@ -383,111 +1898,180 @@ def search_google(query, num_results=3):
         # Cache the results
         search_cache[cache_key] = urls
         return urls
+    except CircuitOpenError:
+        return []
     except Exception as e:
         logger.error(f"Google search error for '{query}': {e}")
-        search_cache[cache_key] = []
+        search_cache[cache_key] = negative_entry(e)
         return []
 
+# Web page fetch limits
+PAGE_MAX_BYTES = 512 * 1024
+PAGE_CHUNK_BYTES = 16 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Stop scanning a page once this many candidate dates have been found
+PAGE_MAX_CANDIDATE_DATES = 5
+
+# Words in class/id attributes and paragraph text that mark history-related blocks
+HISTORY_ATTR_WORDS = ['history', 'about', 'info', 'description', 'background']
+DATE_KEYWORDS = ['built', 'founded', 'established', 'constructed', 'opened', 'began', 'originated', 'started']
+
+# Year patterns, most reliable first
+WEB_YEAR_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'\b(in|from|since|established|built|founded|begun|started|dates? back to)(?:\s+in|\s+during)?\s+(\d{4})\b',
+    r'\bbuilt\s+in\s+(\d{4})\b',
+    r'\bfounded\s+in\s+(\d{4})\b',
+    r'\bestablished\s+in\s+(\d{4})\b',
+    r'\b(circa|c\.)?\s*(\d{4})\b'
+]]
+
+def fetch_page_html(url):
+    """Fetch a page's HTML, checking the content type before the body and stopping at PAGE_MAX_BYTES.
+    
+    Raises HTTPError for error statuses, returns None for other non-200 responses
+    and an empty string for non-HTML content.
+    """
+    headers = {'User-Agent': get_random_user_agent()}
+    
+    # Set a strict timeout and stream so the body is only read if we want it
+    with requests.get(url, headers=headers, timeout=request_timeout(8), stream=True) as response:
+        response.raise_for_status()
+        if response.status_code != 200:
+            return None
+        
+        content_type = response.headers.get('Content-Type', '').lower()
+        if content_type and not any(html_type in content_type for html_type in HTML_CONTENT_TYPES):
+            logger.debug(f"Skipping {url} with content type {content_type}")
+            return ''
+        
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=PAGE_CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= PAGE_MAX_BYTES:
+                break
+        
+        body = b''.join(chunks)[:PAGE_MAX_BYTES]
+        return body.decode(response.encoding or 'utf-8', errors='replace')
+
+def iter_history_texts(soup):
+    """Yield texts of history-related blocks in document order, in a single walk."""
+    for element in soup.find_all(['div', 'p', 'section', 'article']):
+        class_str = ' '.join(element.get('class', [])).lower() if element.get('class') else ''
+        id_str = (element.get('id') or '').lower()
+        
+        # Elements with relevant words in class or id
+        if any(word in class_str or word in id_str for word in HISTORY_ATTR_WORDS):
+            yield element.get_text()
+            continue
+        
+        # Paragraphs with date-related keywords
+        if element.name == 'p':
+            text = element.get_text()
+            if any(keyword in text.lower() for keyword in DATE_KEYWORDS):
+                yield text
+
+def extract_years_from_text(text):
+    """Find plausible years in text using the year patterns."""
+    dates = []
+    for pattern in WEB_YEAR_PATTERNS:
+        for match in pattern.finditer(text):
+            try:
+                # Extract the year from the appropriate group
+                year_str = match.group(2) if len(match.groups()) > 1 else match.group(1)
+                year = int(year_str)
+                if 1500 < year < datetime.now().year:  # Reasonable year range
+                    dates.append(datetime(year, 1, 1))
+            except (ValueError, IndexError, TypeError):
+                continue
+    return dates
+
+def extract_dates_from_html(html):
+    """Scan history-related blocks for candidate dates, stopping once enough are found."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    
+    all_dates = []
+    found_elements = False
+    for text in iter_history_texts(soup):
+        found_elements = True
+        try:
+            all_dates.extend(extract_years_from_text(text))
+            
+            # If no years found yet, try full date extraction
+            if not all_dates:
+                all_dates.extend(datefinder.find_dates(text))
+        except Exception as e:
+            logger.debug(f"Date parsing error: {e}")
+            continue
+        
+        if len(all_dates) >= PAGE_MAX_CANDIDATE_DATES:
+            return all_dates
+    
+    if found_elements:
+        return all_dates
+    
+    # If no specific elements found, try the meta description and title,
+    # then just the first few paragraphs
+    fallback_texts = []
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc:
+        fallback_texts.append(meta_desc.get('content', ''))
+    title = soup.find('title')
+    if title:
+        fallback_texts.append(title.get_text())
+    if not fallback_texts:
+        fallback_texts = [p.get_text() for p in soup.find_all('p', limit=5)]
+    
+    for text in fallback_texts:
+        try:
+            all_dates.extend(extract_years_from_text(text))
+            if not all_dates:
+                all_dates.extend(datefinder.find_dates(text))
+        except Exception as e:
+            logger.debug(f"Date parsing error: {e}")
+    
+    return all_dates
+
 def extract_date_from_web_page(url):
     """Extract date information from a web page."""
     cache_key = get_cache_key(f"web_page_{url}")
     
     # Check cache
-    if cache_key in web_cache:
-        return web_cache[cache_key]
+    hit, cached = cache_get('web', web_cache, cache_key)
+    if hit:
+        return cached
     
     try:
         # Add a delay to avoid being blocked
-        time.sleep(random.uniform(1.0, 2.0))
-        
-        headers = {'User-Agent': get_random_user_agent()}
-        
-        # Set a strict timeout
-        response = requests.get(url, headers=headers, timeout=8)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # First try focused extraction from history-related elements
-            potential_elements = []
-            
-            # Look for elements with relevant words in class or id
-            for element in soup.find_all(['div', 'p', 'section', 'article']):
-                class_str = ' '.join(element.get('class', [])).lower() if element.get('class') else ''
-                id_str = element.get('id', '').lower()
-                
-                if any(word in class_str or word in id_str for word in ['history', 'about', 'info', 'description', 'background']):
-                    potential_elements.append(element.get_text())
-            
-            # Look for paragraphs with date-related keywords
-            date_keywords = ['built', 'founded', 'established', 'constructed', 'opened', 'began', 'originated', 'started']
-            for p in soup.find_all('p'):
-                text = p.get_text().lower()
-                if any(keyword in text for keyword in date_keywords):
-                    potential_elements.append(p.get_text())
-            
-            # If no specific elements found, try the meta description and title
-            if not potential_elements:
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                if meta_desc:
-                    potential_elements.append(meta_desc.get('content', ''))
-                
-                title = soup.find('title')
-                if title:
-                    potential_elements.append(title.get_text())
-            
-            # If still nothing, use just the first few paragraphs (more efficient)
-            if not potential_elements:
-                paragraphs = soup.find_all('p')[:5]  # Just first 5 paragraphs
-                potential_elements = [p.get_text() for p in paragraphs]
-            
-            # Try to find dates in the elements
-            all_dates = []
-            for text in potential_elements:
-                try:
-                    # First look for year patterns which are most reliable
-                    year_patterns = [
-                        r'\b(in|from|since|established|built|founded|begun|started|dates? back to)(?:\s+in|\s+during)?\s+(\d{4})\b',
-                        r'\bbuilt\s+in\s+(\d{4})\b',
-                        r'\bfounded\s+in\s+(\d{4})\b',
-                        r'\bestablished\s+in\s+(\d{4})\b',
-                        r'\b(circa|c\.)?\s*(\d{4})\b'
-                    ]
-                    
-                    for pattern in year_patterns:
-                        matches = re.finditer(pattern, text, re.IGNORECASE)
-                        for match in matches:
-                            try:
-                                # Extract the year from the appropriate group
-                                year_str = match.group(2) if len(match.groups()) > 1 else match.group(1)
-                                year = int(year_str)
-                                if 1500 < year < datetime.now().year:  # Reasonable year range
-                                    all_dates.append(datetime(year, 1, 1))
-                            except (ValueError, IndexError):
-                                continue
-                    
-                    # If no years found, try full date extraction
-                    if not all_dates:
-                        found_dates = list(datefinder.find_dates(text))
-                        all_dates.extend(found_dates)
-                except Exception as e:
-                    logger.debug(f"Date parsing error: {e}")
-                    continue
-            
-            if all_dates:
-                filtered_date = filter_historical_dates(all_dates)
-                # Cache the result
-                web_cache[cache_key] = filtered_date
-                return filtered_date
-            
-            # Cache null result
-            web_cache[cache_key] = None
-                
+        html = http_call('web_page', url, lambda: fetch_page_html(url), delay=(1.0, 2.0))
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        logger.error(f"Error fetching {url}: {e}")
+        web_cache[cache_key] = negative_entry(e)  # Retried once its failure class expires
+        return None
+    
+    if html is None:
+        return None
+    archive_page('web', url, html)
+    
+    try:
+        filtered_date = run_cpu(web_page_date, html)
     except Exception as e:
         logger.error(f"Error extracting date from {url}: {e}")
-        web_cache[cache_key] = None  # Cache null results to avoid repeated errors
+        web_cache[cache_key] = negative_entry(e, 'parse_error')
+        return None
     
-    return None
+    # Cache the result, None when the page simply has no dates
+    web_cache[cache_key] = filtered_date
+    return filtered_date
+
+def web_page_date(html):
+    """The historical date chosen from a page's HTML, or None."""
+    all_dates = extract_dates_from_html(html) if html else []
+    return filter_historical_dates(all_dates) if all_dates else None
 
 def extract_locations_from_text(text):
     """Extract potential location names from text without using spaCy, with enhanced prioritization."""
@@ -547,11 +2131,111 @@ def extract_locations_from_text(text):
     
     return unique_locations
 
+# Dataset columns that name places, used to build the gazetteer
+GAZETTEER_COLUMNS = ['location', 'city', 'state']
+
+# Location candidates looked up per row after pruning
+MAX_LOCATION_CANDIDATES = 3
+
+# Words naming a kind of place; alone they are too generic to look up
+PLACE_TYPE_WORDS = {
+    'house', 'home', 'mansion', 'manor', 'cemetery', 'graveyard', 'church', 'chapel', 'school',
+    'college', 'university', 'hall', 'hospital', 'asylum', 'sanitarium', 'hotel', 'inn', 'tavern',
+    'theater', 'theatre', 'bridge', 'road', 'street', 'park', 'lake', 'river', 'creek', 'mill',
+    'farm', 'plantation', 'fort', 'castle', 'prison', 'jail', 'lighthouse', 'library', 'museum',
+    'courthouse', 'building', 'tunnel', 'woods', 'forest', 'mountain', 'hill', 'island', 'depot',
+    'station', 'mine', 'academy', 'institute', 'center', 'club', 'restaurant', 'county', 'town', 'city'
+}
+
+# Place names known from the dataset and any place-name file
+gazetteer = {'names': set()}
+
+def build_gazetteer(df, places_file=None):
+    """Collect place names from the dataset's place columns and an optional file of one name per line."""
+    names = set()
+    for column in GAZETTEER_COLUMNS:
+        if column in df.columns:
+            names.update(df[column].dropna().astype(str).str.strip().str.lower())
+    
+    if places_file:
+        try:
+            with open(places_file, encoding='utf-8') as f:
+                names.update(line.strip().lower() for line in f if line.strip())
+        except Exception as e:
+            logger.error(f"Error loading place names from {places_file}: {e}")
+    
+    names.discard('')
+    logger.info(f"Gazetteer holds {len(names)} place names")
+    return {'names': names}
+
+def set_gazetteer(df, places_file=None):
+    """Build the module gazetteer used to prune location candidates."""
+    global gazetteer
+    gazetteer = build_gazetteer(df, places_file)
+
+def is_generic_place(location):
+    """Whether a phrase names only a kind of place, like "House" or "The Cemetery"."""
+    words = [word for word in location.lower().split() if word not in ('the', 'a', 'an')]
+    return all(word in PLACE_TYPE_WORDS for word in words)
+
+def location_score(location, row_places=()):
+    """Score a location candidate against the row's own places and the gazetteer; 0 means drop it."""
+    name = location.lower()
+    words = name.split()
+    
+    # Kinds of place say nothing, even when the row's own place contains them
+    if is_generic_place(name):
+        return 0
+    
+    # The row's own location or city, or a multi-word part of it, is the surest match
+    if any(name == place or (len(words) > 1 and f" {name} " in f" {place} ") for place in row_places):
+        return 4
+    if name in gazetteer['names']:
+        return 3
+    
+    # Named places such as "Ada Cemetery"
+    if len(words) > 1 and words[-1] in PLACE_TYPE_WORDS:
+        return 2
+    return 0
+
+def prune_locations(locations, row_places=()):
+    """Rank location candidates by gazetteer evidence and keep the best few.
+    
+    row_places holds the row's (location, city) values, which may be missing. When
+    candidates were found, the row's own location is tried first unless it is only a
+    kind of place. Without a gazetteer or row places only generic words are dropped, so
+    lookups fall back to the old behaviour.
+    """
+    places = [place.strip() if isinstance(place, str) else '' for place in row_places]
+    lowered = [place.lower() for place in places if place]
+    
+    if not gazetteer['names'] and not lowered:
+        return [loc for loc in locations if not is_generic_place(loc)]
+    
+    # Rows with nothing to look up stay local
+    if not locations:
+        return []
+    
+    scored = [(location_score(loc, lowered), i, loc) for i, loc in enumerate(locations)]
+    ranked = [loc for score, _, loc in sorted(scored, key=lambda item: (-item[0], item[1])) if score > 0]
+    
+    # The dataset's location name is itself the best query, scored like any candidate
+    location = places[0] if places else ''
+    if (location and location_score(location, lowered) > 0
+            and location.lower() not in (loc.lower() for loc in ranked)):
+        ranked.insert(0, location)
+    
+    return ranked[:MAX_LOCATION_CANDIDATES]
+
+def row_places(row):
+    """The row's location and city values, most specific first; missing values are None."""
+    return [row.get(column) if isinstance(row.get(column), str) else None for column in ('location', 'city')]
+
 def try_wikipedia_for_location(location, context=""):
     """Try to find dates for a location using Wikipedia only, with early termination."""
     # Check location cache first
-    cache_key = get_cache_key(f"location_{location}")
-    if cache_key in location_date_cache:
+    cache_key = query_key('location', location, 'location', location_date_cache)
+    if cache_lookup('location', location_date_cache, cache_key):
         return location_date_cache[cache_key]
         
     # Generate context-aware search terms
@@ -596,18 +2280,21 @@ def try_wikipedia_for_location(location, context=""):
                         location_date_cache[cache_key] = (date_str, "wikipedia")
                         return date_str, "wikipedia"
     
-    # No date found in Wikipedia
-    location_date_cache[cache_key] = (None, None)
+    # No date found in Wikipedia; don't remember it if lookups were skipped or failed transiently
+    if not circuit_skipped():
+        location_date_cache[cache_key] = (None, None)
     return None, None
 
-def try_google_for_location(location, context=""):
-    """Try to find dates for a location using Google Search and web scraping, with limited queries."""
-    # Check location cache first
-    cache_key = get_cache_key(f"location_google_{location}")
-    if cache_key in location_date_cache:
-        return location_date_cache[cache_key]
-    
-    # Generate targeted search queries
+def wikipedia_search_terms(location, context=""):
+    """Wikipedia search terms try_wikipedia_for_location may use for a location, in order."""
+    if context:
+        contexts = get_location_with_context(location, context)
+    else:
+        contexts = [location, f"{location}, USA"]
+    return contexts[:2] + [f"{contexts[0]} history"]
+
+def google_search_queries(location, context=""):
+    """Google queries try_google_for_location uses for a location, at most 2 for efficiency."""
     search_queries = [
         f"{location} historical date built",
         f"{location} when founded history"
@@ -616,10 +2303,18 @@ def try_google_for_location(location, context=""):
     # If we have context, add a context-specific query
     if context:
         search_queries.insert(0, f"{location} history {context}")
+    return search_queries[:2]
+
+def try_google_for_location(location, context=""):
+    """Try to find dates for a location using Google Search and web scraping, with limited queries."""
+    # Check location cache first
+    cache_key = query_key('location_google', location, 'location', location_date_cache)
+    if cache_lookup('location', location_date_cache, cache_key):
+        return location_date_cache[cache_key]
     
     # Try just 1-2 queries
     all_urls = []
-    for query in search_queries[:2]:  # Limit to just 2 queries for efficiency
+    for query in google_search_queries(location, context):
         urls = search_google(query, num_results=3)  # Limit to top 3 results
         all_urls.extend(urls)
         
@@ -632,24 +2327,38 @@ def try_google_for_location(location, context=""):
     
     # Extract dates from web pages (but limit to 3 concurrent requests)
     dates = []
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        future_to_url = {executor.submit(extract_date_from_web_page, url): url for url in all_urls}
-        
-        for future in as_completed(future_to_url):
-            try:
-                url = future_to_url[future]
-                date = future.result()
-                if date:
-                    dates.append(date)
-                    # Early termination after finding 2 dates (we'll take earliest)
-                    if len(dates) >= 2:
-                        for remaining_future in future_to_url:
-                            if not remaining_future.done():
-                                remaining_future.cancel()
-                        break
-            except Exception as e:
-                logger.error(f"Error processing URL: {e}")
-                continue
+    if not NETWORK_ENABLED:
+        # Cached pages only, so there is nothing to overlap
+        for url in all_urls:
+            date = extract_date_from_web_page(url)
+            if date:
+                dates.append(date)
+                if len(dates) >= 2:
+                    break
+    else:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            fetch_page = bind_row_deadline(extract_date_from_web_page)
+            future_to_url = {executor.submit(fetch_page, url): url for url in all_urls}
+            
+            for future in as_completed(future_to_url):
+                try:
+                    url = future_to_url[future]
+                    date = future.result()
+                    if date:
+                        dates.append(date)
+                        # Early termination after finding 2 dates (we'll take earliest)
+                        if len(dates) >= 2:
+                            for remaining_future in future_to_url:
+                                if not remaining_future.done():
+                                    remaining_future.cancel()
+                            break
+                except Exception as e:
+                    logger.error(f"Error processing URL: {e}")
+                    continue
+    
+    # Page fetches ran on other threads, so check their hosts' circuits here
+    if any(get_host_limiter(request_host('web_page', url)).is_open() for url in all_urls):
+        mark_circuit_skipped()
     
     # If dates were found, return the earliest historical one
     if dates:
@@ -659,22 +2368,18 @@ def try_google_for_location(location, context=""):
             location_date_cache[cache_key] = (date_str, "google")
             return date_str, "google"
     
-    # No dates found via Google
-    location_date_cache[cache_key] = (None, None)
+    # No dates found via Google; don't remember it if lookups were skipped or failed transiently
+    if not circuit_skipped():
+        location_date_cache[cache_key] = (None, None)
     return None, None
 
-def extract_date(description, row_id=None):
-    """Extract dates using a prioritized, multi-stage approach with early termination."""
-    # Check results cache first
-    if row_id and row_id in results_cache:
-        return results_cache[row_id]
-    
-    # Preprocessing to clean up the text
+def clean_description(description):
+    """Preprocessing to clean up the text."""
     description = re.sub(r"March \d{4} Update|February \d{4} Correction", "", description, flags=re.IGNORECASE)
-    description = description.replace("wasn't", "was not").replace("didn't", "did not")
-    original_description = description
-    
-    # Step 1: Check if the date is directly in the description
+    return description.replace("wasn't", "was not").replace("didn't", "did not")
+
+def extract_date_from_description(description):
+    """Run the local regex and dateparser tiers, returning a result or None."""
     # Extract dates directly from the description using regex first
     date_patterns = [
         (r"\b(\d{4})[/-](\d{1,2})[/-](\d{1,2})\b", '%Y/%m/%d'),  # YYYY/MM/DD
@@ -699,10 +2404,7 @@ def extract_date(description, row_id=None):
                 # Check if the date is reasonable
                 if 1500 < date_object.year < datetime.now().year:
                     date_str = date_object.strftime('%Y/%m/%d')
-                    result = (date_str, "description", "high")
-                    if row_id:
-                        results_cache[row_id] = result
-                    return result
+                    return (date_str, "description", "high")
             except (ValueError, IndexError):
                 continue
     
@@ -710,91 +2412,416 @@ def extract_date(description, row_id=None):
     parsed_date = dateparser.parse(description, languages=['en'])
     if parsed_date and 1500 < parsed_date.year < datetime.now().year:
         date_str = parsed_date.strftime('%Y/%m/%d')
-        result = (date_str, "description", "medium")
-        if row_id:
-            results_cache[row_id] = result
-        return result
+        return (date_str, "description", "medium")
+    
+    return None
+
+# Hedged lookups: when the primary location's Wikipedia lookup is slower than this
+# percentile of recent Wikipedia lookups, Google starts too and the first date wins
+HEDGE_ENABLED = False
+HEDGE_PERCENTILE = 95
+HEDGE_DEFAULT_DELAY = 5.0  # seconds, until enough latencies are observed
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = 32
+
+# Lookups faster than this were answered from cache and say nothing about latency
+HEDGE_MIN_LATENCY_SAMPLE = 0.01
+
+wikipedia_latencies = deque(maxlen=500)
+wikipedia_latencies_lock = threading.Lock()
+hedge_executor = None
+hedge_executor_lock = threading.Lock()
+
+def record_wikipedia_latency(seconds):
+    if seconds >= HEDGE_MIN_LATENCY_SAMPLE:
+        with wikipedia_latencies_lock:
+            wikipedia_latencies.append(seconds)
+
+def hedge_delay():
+    """Seconds to wait on Wikipedia before hedging with Google."""
+    with wikipedia_latencies_lock:
+        samples = sorted(wikipedia_latencies)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))]
+
+def start_hedged_side(side, lookup, location, description, cancel):
+    """Run one side of a hedged lookup on a helper thread, under the row's deadline and its own cancel event.
+    
+    The future returns (date_str, source, circuit_skipped); a cancelled side returns no date.
+    """
+    global hedge_executor
+    with hedge_executor_lock:
+        if hedge_executor is None:
+            hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+    deadline, _ = row_deadline()
+    
+    def run():
+        lookup_state.deadline, lookup_state.cancel = deadline, cancel
+        reset_circuit_skips()
+        try:
+            with metrics.timer(side):
+                date_str, source = lookup(location, description)
+        except RowTimeout:
+            date_str, source = None, None
+        finally:
+            clear_row_deadline()
+        return date_str, source, circuit_skipped()
+    
+    return hedge_executor.submit(run)
+
+def hedged_lookup(location, description):
+    """Race Wikipedia and, once it is slow, Google for one location; the first date wins.
+    
+    If Wikipedia answers within the hedge delay without a date, Google runs as it would
+    unhedged. The losing side is cancelled at its next deadline check.
+    """
+    cancels = {'wikipedia': threading.Event(), 'google': threading.Event()}
+    start = time.time()
+    delay = hedge_delay()
+    pending = {start_hedged_side('wikipedia', try_wikipedia_for_location, location, description, cancels['wikipedia']): 'wikipedia'}
+    google_started = hedged = False
     
-    # Step 2: Extract locations and look them up
-    possible_locations = extract_locations_from_text(original_description)
+    try:
+        while pending:
+            check_deadline()
+            
+            # Wikipedia is past the hedge delay, so start Google alongside it
+            if not google_started and time.time() - start >= delay:
+                pending[start_hedged_side('google', try_google_for_location, location, description, cancels['google'])] = 'google'
+                google_started = hedged = True
+                metrics.count_hedge('started')
+            
+            timeout = 0.25 if google_started else max(0.0, min(0.25, start + delay - time.time()))
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                side = pending.pop(future)
+                date_str, source, skipped = future.result()
+                if skipped:
+                    mark_circuit_skipped()
+                if side == 'wikipedia':
+                    record_wikipedia_latency(time.time() - start)
+                
+                if date_str:
+                    for other in pending.values():
+                        cancels[other].set()
+                    if hedged and pending:
+                        metrics.count_hedge(f"{side}_won")
+                    return (date_str, source, "high" if side == 'wikipedia' else "medium")
+                
+                # Wikipedia answered in time without a date, so Google runs as usual
+                if side == 'wikipedia' and not google_started:
+                    pending[start_hedged_side('google', try_google_for_location, location, description, cancels['google'])] = 'google'
+                    google_started = True
+    except RowTimeout:
+        for cancel in cancels.values():
+            cancel.set()
+        raise
+    
+    return (None, None, "low")
+
+def extract_date_from_locations(description, possible_locations):
+    """Look up dates for candidate locations, Wikipedia first and Google for the primary one.
     
-    # Early termination if no locations found
-    if not possible_locations:
-        result = (None, None, "low")
-        if row_id:
-            results_cache[row_id] = result
-        return result
+    Sources whose circuit is open are skipped, so rows fall through to the next tier;
+    check circuit_skipped() afterwards to tell whether a miss is final.
+    """
+    reset_circuit_skips()
     
     # Process each location, starting with the most promising ones
     for location in possible_locations[:3]:  # Limit to top 3 locations for efficiency
-        # Step 2a: Try Wikipedia first (faster and more reliable)
-        date_str, source = try_wikipedia_for_location(location, original_description)
+        check_deadline()
+        
+        # The primary location can race Wikipedia against Google
+        if HEDGE_ENABLED and NETWORK_ENABLED and location == possible_locations[0]:
+            result = hedged_lookup(location, description)
+            if result[0]:
+                return result
+            continue
+        
+        # Try Wikipedia first (faster and more reliable)
+        start = time.time()
+        with metrics.timer('wikipedia'):
+            date_str, source = try_wikipedia_for_location(location, description)
+        record_wikipedia_latency(time.time() - start)
         
         if date_str:
-            result = (date_str, source, "high")
-            if row_id:
-                results_cache[row_id] = result
-            return result
+            return (date_str, source, "high")
         
-        # Step 2b: If Wikipedia fails, try Google for just the first/primary location
+        # If Wikipedia fails, try Google for just the first/primary location
         if location == possible_locations[0]:
-            date_str, source = try_google_for_location(location, original_description)
+            with metrics.timer('google'):
+                date_str, source = try_google_for_location(location, description)
             
             if date_str:
-                result = (date_str, source, "medium")
-                if row_id:
-                    results_cache[row_id] = result
-                return result
+                return (date_str, source, "medium")
     
     # set no date was found
-    result = (None, None, "low")
-    if row_id:
+    return (None, None, "low")
+
+def record_result(row_id, description, result, final=True):
+    """Cache a row's result, mark it processed and return its result row.
+    
+    Non-final results are returned but not cached, so the row is retried on the next run.
+    """
+    date_str, source, confidence = result
+    metrics.count_row(source)
+    
+    # Mark as processed
+    if final:
         results_cache[row_id] = result
-    return result
+        processed_ids.add(row_id)
+    
+    # Log progress
+    if date_str:
+        status = "Date found"
+    elif final:
+        status = "No date found"
+    else:
+        status = "Deferred, timed out" if row_id in timed_out_ids else "Deferred, source unavailable"
+    log_row(logger, "Processed ID %s: %s (Source: %s, Confidence: %s)", row_id, status, source, confidence)
+    
+    # Save progress periodically; offline runs fetch nothing and save once at the end
+    if NETWORK_ENABLED and len(processed_ids) % 50 == 0:
+        save_cache()
+    
+    return {
+        'id': row_id,
+        'description': description,
+        'extracted_date': date_str,
+        'source': source,
+        'confidence': confidence
+    }
 
-def process_batch(batch):
-    """Process a batch of entries."""
-    results = []
-    for _, row in batch.iterrows():
-        row_id = row['id']
-        
-        # Skip if already processed
-        if row_id in processed_ids:
-            logger.info(f"Skipping already processed ID {row_id}")
+def process_row(task, deadline=None):
+    """Run the planned network lookups for one row under its own deadline.
+    
+    A row that runs out of time is returned without a date and left unprocessed, and
+    the watchdog records it for the retry pass. Returns None for rows already processed.
+    """
+    deadline = deadline or ROW_DEADLINE
+    row_id = task['id']
+    
+    # Skip if already processed
+    if row_id in processed_ids:
+        log_row(logger, "Skipping already processed ID %s", row_id)
+        return None
+    
+    # Local tiers already ran in phase one, so go straight to the lookups
+    take_network_needs()
+    watchdog.start_row(row_id, deadline)
+    try:
+        result = extract_date_from_locations(task['cleaned'], task['locations'])
+    except RowTimeout:
+        logger.warning(f"ID {row_id} timed out after {deadline}s; queued for retry")
+        watchdog.finish_row(row_id, timed_out=True)
+        return record_result(row_id, task['description'], (None, None, "low"), final=False)
+    watchdog.finish_row(row_id)
+    
+    final = result[0] is not None or not circuit_skipped()
+    needs = take_network_needs()
+    if not final and needs:
+        offline_misses[row_id] = (task['locations'][0], needs)
+    return record_result(row_id, task['description'], result, final=final)
+
+def run_rows_offline(tasks):
+    """Resolve rows one after another from the caches alone, with no pools or sleeps."""
+    result_rows = []
+    progress = ProgressReporter(logger, len(tasks), 'Offline rows')
+    for task in tasks:
+        outcome = 'skipped'
+        try:
+            row = process_row(task)
+            if row:
+                result_rows.append(row)
+                outcome = 'found' if row['extracted_date'] else 'missed'
+        except Exception as e:
+            logger.error(f"Error processing row: {e}")
+            outcome = 'errors'
+        progress.update(**{outcome: 1})
+    progress.close()
+    return result_rows
+
+def write_offline_report():
+    """Write the rows an offline run left unresolved and the requests each would need."""
+    if not offline_misses:
+        logger.info("Offline run: every row was resolved from the caches")
+        if os.path.exists(OFFLINE_REPORT_FILE):
+            os.remove(OFFLINE_REPORT_FILE)
+        return
+    
+    report = pd.DataFrame(
+        [(row_id, location, len(needs), '; '.join(f"{kind}:{key}" for kind, key in needs))
+         for row_id, (location, needs) in offline_misses.items()],
+        columns=['id', 'location', 'requests', 'needed']
+    )
+    report.to_csv(OFFLINE_REPORT_FILE, sep='\t', index=False)
+    kinds = Counter(kind for _, needs in offline_misses.values() for kind, _ in needs)
+    logger.info(f"Offline run: {len(offline_misses)} rows need a fetch ({dict(kinds)}); "
+                f"listed in {OFFLINE_REPORT_FILE}")
+
+# Rows queued per worker beyond the one it is running, so a worker never waits for work
+MAX_IN_FLIGHT_PER_WORKER = 2
+
+def run_row_queue(executor, tasks, max_workers, deadline=None, save_every=200):
+    """Dispatch rows one at a time in planned order, keeping a bounded number in flight.
+    
+    Each worker takes the next row as soon as it finishes one, so a slow row only
+    holds up its own worker and every worker stays busy until the queue is empty.
+    """
+    result_rows = []
+    queue = iter(tasks)
+    in_flight = set()
+    max_in_flight = max_workers * MAX_IN_FLIGHT_PER_WORKER
+    save_every = max(1, save_every)
+    progress = ProgressReporter(logger, len(tasks), 'Network rows')
+    
+    def fill():
+        for task in queue:
+            in_flight.add(executor.submit(process_row, task, deadline))
+            if len(in_flight) >= max_in_flight:
+                return
+    
+    fill()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            in_flight.discard(future)
+            outcome = 'skipped'
+            try:
+                row = future.result()
+                if row:  # Skip rows that were already processed
+                    result_rows.append(row)
+                    outcome = 'found' if row['extracted_date'] else 'missed'
+            except Exception as e:
+                logger.error(f"Error processing row: {e}")
+                outcome = 'errors'
+            
+            # Update progress
+            progress.update(**{outcome: 1})
+            metrics.set_gauge('queue_depth', len(tasks) - progress.done)
+            
+            # Save caches periodically
+            if progress.done % save_every == 0:
+                save_cache(force=True)
+        fill()
+    
+    progress.close()
+    return result_rows
+
+def run_local_phase(unprocessed_df):
+    """Phase one: resolve every row the local regex and parser tiers can answer.
+    
+    Returns the finished result rows and the tasks that still need network lookups.
+    """
+    result_rows = []
+    pending = []
+    
+    place_columns = [column for column in ('location', 'city') if column in unprocessed_df.columns]
+    places = unprocessed_df[place_columns].to_dict('records') if place_columns else [{}] * len(unprocessed_df)
+    
+    rows = []
+    for row_id, description, row in zip(unprocessed_df['id'], unprocessed_df['description'], places):
+        if cache_lookup('results', results_cache, row_id):
+            result_rows.append(record_result(row_id, description, results_cache[row_id]))
+        else:
+            rows.append((row_id, description, row))
+    
+    # The local tiers are pure CPU, so chunks of rows go to the worker processes
+    with metrics.timer('local'):
+        extracted = [item for chunk in cpu_map(local_extract, chunked(rows)) for item in chunk]
+    
+    for row_id, description, cleaned, result, possible_locations, error in extracted:
+        if error:
+            logger.error(f"Error in local extraction for ID {row_id}: {error}")
             continue
         
-        description = row['description']
-        
-        # Extract date with optimized algorithm
-        date_str, source, confidence = extract_date(description, row_id)
-        
-        # Add to results
-        results.append({
-            'id': row_id,
-            'description': description,
-            'extracted_date': date_str,
-            'source': source,
-            'confidence': confidence
-        })
-        
-        # Mark as processed
-        processed_ids.add(row_id)
-        
-        # Log progress
-        status = "Date found" if date_str else "No date found"
-        logger.info(f"Processed ID {row_id}: {status} (Source: {source}, Confidence: {confidence})")
+        if result is None:
+            if possible_locations:
+                pending.append({
+                    'id': row_id,
+                    'description': description,
+                    'cleaned': cleaned,
+                    'locations': possible_locations
+                })
+                continue
+            result = (None, None, "low")
         
-        # Save progress periodically
-        if len(processed_ids) % 50 == 0:
-            save_cache()
+        result_rows.append(record_result(row_id, description, result))
     
-    return results
+    return result_rows, pending
+
+def local_extract(rows):
+    """Run the local tiers over (id, description, places) rows, in a worker process or inline.
+    
+    Returns (id, description, cleaned, result, locations, error) per row; result is None
+    when the row needs the location lookups.
+    """
+    extracted = []
+    for row_id, description, row in rows:
+        try:
+            cleaned = clean_description(description)
+            result = extract_date_from_description(cleaned)
+            if result is None:
+                possible_locations = prune_locations(extract_locations_from_text(cleaned), row_places(row))
+            else:
+                possible_locations = []
+            extracted.append((row_id, description, cleaned, result, possible_locations, None))
+        except Exception as e:
+            extracted.append((row_id, description, None, None, None, str(e)))
+    return extracted
+
+# Rough number of requests a location lookup costs when nothing is cached
+EST_REQUESTS_PER_LOCATION = 4
+
+def location_lookup_cost(location):
+    """Estimate the requests a location lookup needs, 0 if its answer is already cached."""
+    if query_key('location', location) in location_date_cache:
+        return 0
+    if query_key('wikipedia_search', location) in wikipedia_cache:
+        return EST_REQUESTS_PER_LOCATION / 2
+    return EST_REQUESTS_PER_LOCATION
+
+def location_success_prior(location):
+    """Rough chance a lookup finds a date; longer, more specific names do better."""
+    return min(len(location.split()), 4) / 4
+
+def plan_network_tasks(pending):
+    """Phase two: order rows needing lookups by expected successes per request.
+    
+    Rows are grouped by primary location. One leader per group runs first, ranked by
+    rows served times success prior over cost, and the rest follow once its answer is cached.
+    """
+    groups = OrderedDict()
+    for task in pending:
+        groups.setdefault(task['locations'][0], []).append(task)
+    
+    def priority(item):
+        location, tasks = item
+        cost = location_lookup_cost(location)
+        expected = len(tasks) * location_success_prior(location)
+        return expected / cost if cost else float('inf')
+    
+    ranked = sorted(groups.items(), key=priority, reverse=True)
+    leaders = [tasks[0] for _, tasks in ranked]
+    followers = [task for _, tasks in ranked for task in tasks[1:]]
+    
+    logger.info(f"Planned {len(pending)} network rows over {len(leaders)} unique primary locations")
+    return leaders + followers
+
+def pending_wikipedia_titles(pending):
+    """Top search results already cached for the pending rows' Wikipedia lookups."""
+    titles = []
+    for task in pending:
+        for location in task['locations']:
+            for term in wikipedia_search_terms(location, task['cleaned']):
+                results = wikipedia_cache.get(query_key('wikipedia_search', term))
+                if isinstance(results, list) and results:
+                    titles.append(results[0])
+    return titles
 
 def process_dataframe_parallel(df, batch_size=10, max_workers=4):
-    """Process a DataFrame in parallel batches, with resumable processing."""
-    # Initialize result DataFrame
-    result_df = pd.DataFrame(columns=['id', 'description', 'extracted_date', 'source', 'confidence'])
-    
+    """Process a DataFrame in two phases, local tiers then planned lookups, with resumable processing."""
     # Get unprocessed rows
     unprocessed_df = df[~df['id'].isin(processed_ids)]
     logger.info(f"Processing {len(unprocessed_df)} unprocessed entries out of {len(df)} total entries")
@@ -803,98 +2830,83 @@ def process_dataframe_parallel(df, batch_size=10, max_workers=4):
     if len(unprocessed_df) == 0:
         if os.path.exists(RESULTS_CACHE_FILE):
             try:
-                # Convert cached results to DataFrame
-                cached_results = []
-                for row_id, (date_str, source, confidence) in results_cache.items():
-                    original_row = df[df['id'] == row_id]
-                    if not original_row.empty:
-                        cached_results.append({
-                            'id': row_id,
-                            'description': original_row['description'].values[0],
-                            'extracted_date': date_str,
-                            'source': source,
-                            'confidence': confidence
-                        })
+                # Join cached results onto the dataset by id in one pass
+                cached_df = create_result_df(df)
                 
-                if cached_results:
-                    result_df = pd.DataFrame(cached_results)
-                    logger.info(f"Loaded all {len(result_df)} entries from cache")
-                    return result_df
+                if not cached_df.empty:
+                    logger.info(f"Loaded all {len(cached_df)} entries from cache")
+                    return cached_df
             except Exception as e:
                 logger.error(f"Error loading cached results: {e}")
     
-    # Sort by description length 
-    unprocessed_df.loc[:, 'desc_len'] = unprocessed_df['description'].str.len()
-    unprocessed_df = unprocessed_df.sort_values('desc_len')
-    unprocessed_df = unprocessed_df.drop(columns=['desc_len'])
+    # Phase one: cheap local extraction over every row
+    phase_start = time.time()
+    result_rows, pending = run_local_phase(unprocessed_df)
+    logger.info(f"Phase one resolved {len(result_rows)}/{len(unprocessed_df)} rows locally "
+                f"in {time.time() - phase_start:.2f} seconds")
+    
+    # Phase two: planned network lookups for the rest, with known pages fetched in batches first
+    tasks = plan_network_tasks(pending)
     
-    # Split the df into batches
-    batches = [unprocessed_df.iloc[i:i+batch_size] for i in range(0, len(unprocessed_df), batch_size)]
+    # Without the network, resolve what the caches can and report the rest
+    if not NETWORK_ENABLED:
+        result_rows.extend(run_rows_offline(tasks))
+        write_offline_report()
+        save_cache(force=True)
+        return combine_cached_results(df, pd.DataFrame(result_rows, columns=RESULT_COLUMNS))
+    
+    prefetch_wikipedia_pages(pending_wikipedia_titles(tasks))
+    
+    # Rows that timed out on an earlier run wait for the retry pass
+    retry_tasks = [task for task in tasks if task['id'] in timed_out_ids]
+    tasks = [task for task in tasks if task['id'] not in timed_out_ids]
     
     # Save the initial state of caches
     save_cache()
+    metrics.set_gauge('queue_depth', len(tasks))
     
-    # Calculate total batches for progress reporting
-    total_batches = len(batches)
-    completed_batches = 0
-    
+    watchdog.start()
     try:
-        # Process batches in parallel
+        # Process rows in parallel from one shared queue, in the planned order
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(process_batch, batch): i for i, batch in enumerate(batches)}
+            result_rows.extend(run_row_queue(executor, tasks, max_workers, save_every=batch_size * 10))
             
-            for future in as_completed(futures):
-                try:
-                    batch_results = future.result()
-                    if batch_results:  # Skip empty results (already processed)
-                        batch_df = pd.DataFrame(batch_results)
-                        result_df = pd.concat([result_df, batch_df], ignore_index=True)
-                    
-                    # Update progress
-                    completed_batches += 1
-                    progress_pct = (completed_batches / total_batches) * 100
-                    logger.info(f"Completed batch {completed_batches}/{total_batches} ({progress_pct:.1f}%)")
-                    
-                    # Save caches every 10 batches
-                    if completed_batches % 10 == 0:
-                        save_cache(force=True)
-                        
-                except Exception as e:
-                    logger.error(f"Error processing batch {futures[future]}: {e}")
+            # Retry pass: rows that timed out get one more, longer try
+            retry_tasks += [task for task in tasks if task['id'] in timed_out_ids]
+            if retry_tasks:
+                retry_deadline = ROW_DEADLINE * RETRY_DEADLINE_FACTOR
+                logger.info(f"Retrying {len(retry_tasks)} timed-out rows with a {retry_deadline}s deadline")
+                retry_ids = {task['id'] for task in retry_tasks}
+                result_rows = [row for row in result_rows if row['id'] not in retry_ids]
+                result_rows.extend(run_row_queue(executor, retry_tasks, max_workers, retry_deadline, batch_size * 10))
+                
+                if timed_out_ids:
+                    logger.warning(f"{len(timed_out_ids)} rows still timed out; they are retried on the next run")
     except KeyboardInterrupt:
         logger.warning("Process interrupted by user. Saving current progress...")
         save_cache(force=True)
     except Exception as e:
         logger.error(f"Error in parallel processing: {e}")
         save_cache(force=True)
+    finally:
+        watchdog.stop()
     
     # Save final state
     save_cache(force=True)
     
-    # Combine with previously processed results
+    return combine_cached_results(df, pd.DataFrame(result_rows, columns=RESULT_COLUMNS))
+
+def combine_cached_results(df, result_df):
+    """Add cached results for the rows of df that this run did not process."""
     if len(result_df) < len(df) and results_cache:
         try:
             # Get processed rows not in current result_df
-            cached_ids = set(results_cache.keys())
-            missing_ids = cached_ids - set(result_df['id'].astype(str))
-            
-            cached_results = []
-            for row_id in missing_ids:
-                date_str, source, confidence = results_cache.get(row_id, (None, None, "low"))
-                original_row = df[df['id'] == row_id]
-                if not original_row.empty:
-                    cached_results.append({
-                        'id': row_id,
-                        'description': original_row['description'].values[0],
-                        'extracted_date': date_str,
-                        'source': source,
-                        'confidence': confidence
-                    })
+            missing_df = df[~df['id'].astype(str).isin(result_df['id'].astype(str))]
+            cached_df = create_result_df(missing_df)
             
-            if cached_results:
-                cached_df = pd.DataFrame(cached_results)
+            if not cached_df.empty:
                 result_df = pd.concat([result_df, cached_df], ignore_index=True)
-                logger.info(f"Added {len(cached_results)} entries from cache")
+                logger.info(f"Added {len(cached_df)} entries from cache")
         except Exception as e:
             logger.error(f"Error combining with cached results: {e}")
     
@@ -939,7 +2951,7 @@ def post_process_results(result_df):
         result_df.loc[result_df['extracted_date'] == '2025/01/01', 'confidence'] = 'low'
         logger.info(f"Added default date (2025/01/01) to {total_rows - dates_found} entries")
         
-        return result_df
+    return result_df
 
 # Define a function to clean up and prepare the dataset
 def prepare_dataset(df):
@@ -973,22 +2985,37 @@ def prepare_dataset(df):
     
     return df
 
+def results_cache_frame():
+    """Return results_cache as a DataFrame indexed by string id."""
+    # Snapshot the dict so worker threads can keep writing to it
+    cached = dict(results_cache)
+    cache_df = pd.DataFrame.from_dict(cached, orient='index', columns=RESULT_COLUMNS[2:])
+    cache_df.index = cache_df.index.astype(str)
+    cache_df.index.name = 'id'
+    return cache_df
+
 def create_result_df(df):
     """Create a result DataFrame from cache data."""
-    results = []
-    for _, row in df.iterrows():
-        str_id = str(row['id'])
-        if str_id in results_cache:
-            date_str, source, confidence = results_cache[str_id]
-            results.append({
-                'id': row['id'],
-                'description': row['description'],
-                'extracted_date': date_str,
-                'source': source,
-                'confidence': confidence
-            })
+    if df.empty or not results_cache:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
     
-    return pd.DataFrame(results)
+    # Inner join on the string id, keeping the dataset's row order
+    keys = df['id'].astype(str).rename('_key')
+    result_df = df[['id', 'description']].join(keys).join(results_cache_frame(), on='_key', how='inner')
+    
+    return result_df.drop(columns=['_key']).reset_index(drop=True)[RESULT_COLUMNS]
+
+def date_columns_lookup(result_df, key):
+    """Index the result columns by a join key, last entry winning on duplicates."""
+    lookup = result_df.assign(_key=key).drop_duplicates(subset=['_key'], keep='last')
+    return lookup.set_index('_key')[['extracted_date', 'source', 'confidence']]
+
+def description_merge_key(descriptions):
+    """Build the 'location|city' key from the first two comma-separated description parts."""
+    text = descriptions.where(descriptions.map(type) == str, '').astype(str)
+    parts = text.str.partition(',')
+    key = parts[0] + '|' + parts[2].str.split(',').str[0].str.strip()
+    return key.where(parts[1] == ',', '')
 
 def merge_with_original(original_df, result_df):
     """Merge the extracted dates back into the original dataset."""
@@ -997,52 +3024,38 @@ def merge_with_original(original_df, result_df):
     
     # Convert IDs to numeric if possible for proper matching
     try:
-        result_df['id_numeric'] = pd.to_numeric(result_df['id'])
+        id_numeric = pd.to_numeric(result_df['id'])
         # If successful, this means IDs are likely row indices
         
         # Checking if merged_df has an index that matches
-        if len(merged_df) == result_df['id_numeric'].max() + 1:
+        if len(merged_df) == id_numeric.max() + 1:
             
-            # Add extracted info based on index
-            for idx, row in result_df.iterrows():
-                try:
-                    id_num = int(row['id'])
-                    if 0 <= id_num < len(merged_df):
-                        merged_df.loc[id_num, 'evidence_date'] = row['extracted_date']
-                        merged_df.loc[id_num, 'date_source'] = row['source']
-                        merged_df.loc[id_num, 'date_confidence'] = row['confidence']
-                except (ValueError, TypeError):
-                    pass
+            # Keep whole-number ids that fall inside the dataset and align on the index
+            valid = (id_numeric == id_numeric.round()) & (id_numeric >= 0) & (id_numeric < len(merged_df))
+            lookup = date_columns_lookup(result_df[valid], id_numeric[valid].astype(int))
+            lookup = lookup.reindex(merged_df.index)
+            
+            merged_df['evidence_date'] = lookup['extracted_date']
+            merged_df['date_source'] = lookup['source']
+            merged_df['date_confidence'] = lookup['confidence']
         else:
             # Create a composite key from location+city for matching
-            merged_df['temp_key'] = merged_df['location'] + '|' + merged_df['city']
-            result_df['temp_key'] = result_df['description'].apply(
-                lambda x: x.split(',')[0] + '|' + (x.split(',')[1].strip() if len(x.split(',')) > 1 else '')
-                if isinstance(x, str) and ',' in x else '')
+            temp_key = merged_df['location'] + '|' + merged_df['city']
+            lookup = date_columns_lookup(result_df, description_merge_key(result_df['description']))
             
             # Now join on this composite key
-            key_dict = dict(zip(result_df['temp_key'], result_df['extracted_date']))
-            source_dict = dict(zip(result_df['temp_key'], result_df['source']))
-            conf_dict = dict(zip(result_df['temp_key'], result_df['confidence']))
-            
-            merged_df['evidence_date'] = merged_df['temp_key'].map(key_dict)
-            merged_df['date_source'] = merged_df['temp_key'].map(source_dict)
-            merged_df['date_confidence'] = merged_df['temp_key'].map(conf_dict)
-            
-            # Drop the temporary key
-            merged_df = merged_df.drop(columns=['temp_key'])
+            merged_df['evidence_date'] = temp_key.map(lookup['extracted_date'])
+            merged_df['date_source'] = temp_key.map(lookup['source'])
+            merged_df['date_confidence'] = temp_key.map(lookup['confidence'])
             
     except (ValueError, TypeError):
         # Just directly map using the id strings
         merged_df['id'] = merged_df.index.astype(str)
+        lookup = date_columns_lookup(result_df, result_df['id'])
         
-        date_dict = dict(zip(result_df['id'], result_df['extracted_date']))
-        source_dict = dict(zip(result_df['id'], result_df['source']))
-        confidence_dict = dict(zip(result_df['id'], result_df['confidence']))
-        
-        merged_df['evidence_date'] = merged_df['id'].map(date_dict)
-        merged_df['date_source'] = merged_df['id'].map(source_dict)
-        merged_df['date_confidence'] = merged_df['id'].map(confidence_dict)
+        merged_df['evidence_date'] = merged_df['id'].map(lookup['extracted_date'])
+        merged_df['date_source'] = merged_df['id'].map(lookup['source'])
+        merged_df['date_confidence'] = merged_df['id'].map(lookup['confidence'])
     
     # Fill any missing values
     merged_df['evidence_date'] = merged_df['evidence_date'].fillna('2025/01/01')
@@ -1055,9 +3068,566 @@ def merge_with_original(original_df, result_df):
     
     return merged_df
 
+def shard_of(row_id, num_shards):
+    """Stable hash partition of a row id, identical on every machine."""
+    return int(hashlib.md5(str(row_id).encode()).hexdigest(), 16) % num_shards
+
+def shard_cache_dir(shard_index, num_shards):
+    """Cache directory holding one shard's caches and progress file."""
+    return os.path.join(BASE_CACHE_DIR, f"shard_{shard_index}_of_{num_shards}")
+
+def shard_output_file(output_file, shard_index, num_shards):
+    """Per-shard results file next to the final output."""
+    base, ext = os.path.splitext(output_file)
+    return f"{base}_shard_{shard_index}_of_{num_shards}{ext}"
+
+def save_outputs(original_df, result_df, output_file):
+    """Save results, the merged original dataset and a timestamped backup."""
+    # Save results
+    result_df.to_csv(output_file, index=False)
+    logger.info(f"Results saved to {output_file}")
+    
+    # Create merged dataset with dates added to original data
+    merged_df = merge_with_original(original_df, result_df)
+    merged_output = f"{os.path.splitext(output_file)[0]}.csv"
+    merged_df.to_csv(merged_output, index=False)
+    logger.info(f"Merged dataset saved to {merged_output}")
+    
+    # Save a timestamp-versioned backup
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    backup_file = f"{output_file.rsplit('.', 1)[0]}_{timestamp}.csv"
+    result_df.to_csv(backup_file, index=False)
+    logger.info(f"Backup saved to {backup_file}")
+
+def merge_shards(input_file, output_file, num_shards):
+    """Combine shard caches and progress into the main cache, then write the final outputs."""
+    global processed_ids
+    
+    # Start from whatever the main cache already holds
+    load_cache()
+    
+    for shard_index in range(num_shards):
+        shard_dir = shard_cache_dir(shard_index, num_shards)
+        if not os.path.isdir(shard_dir):
+            logger.warning(f"Missing shard directory {shard_dir}, its rows will be left unprocessed")
+            continue
+        
+        paths = cache_paths(shard_dir)
+        for name, cache in [('wikipedia', wikipedia_cache), ('search', search_cache),
+                            ('web', web_cache), ('results', results_cache)]:
+            try:
+                if os.path.exists(paths[name]):
+                    cache.update(read_cache_file(paths[name]))
+            except Exception as e:
+                logger.error(f"Error merging {name} cache from {shard_dir}: {e}")
+        
+        try:
+            if os.path.exists(paths['progress']):
+                with open(paths['progress'], 'r') as f:
+                    processed_ids |= set(json.load(f).get('processed_ids', []))
+        except Exception as e:
+            logger.error(f"Error merging progress from {shard_dir}: {e}")
+        
+        logger.info(f"Merged shard {shard_index + 1}/{num_shards} from {shard_dir}")
+    
+    save_cache(force=True)
+    
+    # Build the final outputs from the combined results
+    df = pd.read_csv(input_file)
+    original_df = df.copy()
+    df = prepare_dataset(df)
+    
+    result_df = create_result_df(df)
+    missing = len(df) - len(result_df)
+    if missing:
+        logger.warning(f"{missing} rows have no result in any shard")
+    
+    result_df = post_process_results(result_df)
+    save_outputs(original_df, result_df, output_file)
+    
+    return result_df
+
+# Cache maintenance: the cache-* commands work on the cache files directly, so run
+# them while no extraction is writing to the same cache directory
+CACHE_STORES = ['wikipedia', 'search', 'web', 'results']
+CACHE_COMMANDS = ['cache-info', 'cache-purge', 'cache-compact', 'cache-export', 'cache-import']
+
+def archived_page_keys():
+    """Cache key -> (label, archived_at) for every page in the page archive."""
+    keys = {}
+    for entry in read_archive_index():
+        prefix = 'wikipedia_page_' if entry['kind'] == 'wiki' else 'web_page_'
+        keys[get_cache_key(prefix + entry['key'])] = (f"{entry['kind']}:{entry['key']}", entry['archived_at'])
+    return keys
+
+def cache_entry_label(name, key, value, page_keys):
+    """Readable name for an entry, since most cache keys are hashes."""
+    if key in page_keys:
+        return page_keys[key][0]
+    if name == 'results':
+        return f"row {key}"
+    if isinstance(value, dict) and 'title' in value:
+        return value['title']
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value[:3])
+    if is_negative(value):
+        return value['message']
+    return ''
+
+def cache_entry_time(key, value, page_keys):
+    """When an entry was written, if known: failures and archived pages carry a time."""
+    if is_negative(value):
+        return value['cached_at']
+    if key in page_keys:
+        return page_keys[key][1]
+    return None
+
+def negative_expired(value, now=None):
+    ttl = NEGATIVE_CACHE_TTL.get(value['failure'], NEGATIVE_CACHE_TTL['other'])
+    return (now or time.time()) - value['cached_at'] > ttl
+
+def read_store(name):
+    """Entries of one cache store as a plain dict, empty if it has no file yet."""
+    path = cache_paths(CACHE_DIR)[name]
+    return read_cache_file(path) if os.path.exists(path) else {}
+
+def read_progress():
+    if not os.path.exists(PROGRESS_FILE):
+        return {'processed_ids': [], 'timed_out_ids': []}
+    with open(PROGRESS_FILE) as f:
+        return json.load(f)
+
+def write_progress(progress):
+    tmp_path = f"{PROGRESS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def cache_info():
+    """Log each store's size, entries, failure classes and last run's hit statistics."""
+    logger.info(f"Cache directory: {CACHE_DIR}")
+    page_keys = archived_page_keys()
+    now = time.time()
+    
+    for name in CACHE_STORES:
+        path = cache_paths(CACHE_DIR)[name]
+        if not os.path.exists(path):
+            logger.info(f"{name}: no cache file")
+            continue
+        
+        with open(path, 'rb') as f:
+            compressed = f.read(4) == ZSTD_MAGIC
+        entries = read_store(name)
+        failures = Counter(value['failure'] for value in entries.values() if is_negative(value))
+        expired = sum(1 for value in entries.values() if is_negative(value) and negative_expired(value, now))
+        times = [t for t in (cache_entry_time(key, value, page_keys) for key, value in entries.items()) if t]
+        
+        line = (f"{name}: {len(entries)} entries, {os.path.getsize(path) / 1024:.1f} KiB "
+                f"({'zstd' if compressed else 'plain pickle'}), {sum(failures.values())} failures")
+        if failures:
+            line += f" {dict(failures.most_common())}, {expired} expired"
+        if times:
+            line += f", oldest dated entry {(now - min(times)) / 86400:.1f} days old"
+        logger.info(line)
+    
+    progress = read_progress()
+    logger.info(f"progress: {len(progress.get('processed_ids', []))} processed IDs, "
+                f"{len(progress.get('timed_out_ids', []))} timed out")
+    
+    if os.path.isdir(PAGE_ARCHIVE_DIR):
+        entries = archived_pages()
+        blobs_dir = os.path.join(PAGE_ARCHIVE_DIR, 'blobs')
+        blobs = sum(len(names) for _, _, names in os.walk(blobs_dir))
+        kinds = Counter(kind for kind, _ in entries)
+        logger.info(f"pages: {len(entries)} archived pages {dict(kinds)} in {blobs} blobs, "
+                    f"{directory_size(PAGE_ARCHIVE_DIR) / 1024:.1f} KiB")
+    
+    # Hit statistics come from the last run's metrics file
+    metrics_path = os.path.join(CACHE_DIR, 'metrics.json')
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            last_run = json.load(f)
+        for name, stats in last_run.get('caches', {}).items():
+            logger.info(f"last run, {name}: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['hit_ratio'] * 100:.1f}% hit ratio)")
+
+def purge_matches(name, key, value, page_keys, cutoff, pattern, failure):
+    """Whether an entry matches every given purge criterion."""
+    if cutoff is not None:
+        written = cache_entry_time(key, value, page_keys)
+        if written is None or written > cutoff:
+            return False
+    if failure is not None and not (is_negative(value) and value['failure'] == failure):
+        return False
+    if pattern is not None and not (pattern.search(str(key)) or
+                                    pattern.search(cache_entry_label(name, key, value, page_keys))):
+        return False
+    return True
+
+def cache_purge(sources=None, older_than=None, key_pattern=None, failure=None, dry_run=False):
+    """Drop entries matching every given criterion from the chosen stores.
+    
+    older_than is in days and only matches entries with a known time (failures and
+    archived pages). key_pattern is a regex tried on the key and the entry's title, URL
+    or message. Purged results are also unmarked as processed, so those rows rerun.
+    """
+    sources = sources or CACHE_STORES + ['pages']
+    cutoff = time.time() - older_than * 86400 if older_than is not None else None
+    pattern = re.compile(key_pattern, re.IGNORECASE) if key_pattern else None
+    page_keys = archived_page_keys()
+    
+    for name in sources:
+        if name == 'pages':
+            # Only fetched pages are archived, never failures
+            if failure is None:
+                purge_pages(cutoff, pattern, dry_run)
+            continue
+        
+        entries = read_store(name)
+        purged = [key for key, value in entries.items()
+                  if purge_matches(name, key, value, page_keys, cutoff, pattern, failure)]
+        logger.info(f"{name}: {'would purge' if dry_run else 'purging'} {len(purged)} of {len(entries)} entries")
+        if dry_run or not purged:
+            continue
+        
+        for key in purged:
+            del entries[key]
+        write_cache_file(cache_paths(CACHE_DIR)[name], entries, bounded=name != 'results')
+        
+        if name == 'results':
+            progress = read_progress()
+            purged_ids = set(purged)
+            progress['processed_ids'] = [row_id for row_id in progress.get('processed_ids', []) if row_id not in purged_ids]
+            write_progress(progress)
+
+def purge_pages(cutoff, pattern, dry_run=False):
+    """Drop matching page archive entries and the blobs left unused."""
+    entries = list(read_archive_index())
+    kept = [entry for entry in entries
+            if not ((cutoff is None or entry['archived_at'] <= cutoff) and
+                    (pattern is None or pattern.search(f"{entry['kind']}:{entry['key']}")))]
+    logger.info(f"pages: {'would purge' if dry_run else 'purging'} {len(entries) - len(kept)} of {len(entries)} index entries")
+    if not dry_run and len(kept) < len(entries):
+        write_archive_index(kept)
+        compact_page_archive()
+
+def write_archive_index(entries):
+    global archive_latest
+    
+    os.makedirs(PAGE_ARCHIVE_DIR, exist_ok=True)
+    index_file = os.path.join(PAGE_ARCHIVE_DIR, 'index.jsonl')
+    tmp_path = f"{index_file}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+    os.replace(tmp_path, index_file)
+    archive_latest = None
+
+def cache_compact():
+    """Rewrite every store in the current format, dropping expired failures and unused page blobs.
+    
+    Old WikipediaPage objects are migrated to compact pages and plain pickles are
+    recompressed when compression is enabled.
+    """
+    now = time.time()
+    for name in CACHE_STORES:
+        path = cache_paths(CACHE_DIR)[name]
+        if not os.path.exists(path):
+            continue
+        before = os.path.getsize(path)
+        entries = read_store(name)
+        compacted = {}
+        for key, value in entries.items():
+            if is_negative(value) and negative_expired(value, now):
+                continue
+            if isinstance(value, wikipedia.WikipediaPage):
+                value = compact_wikipedia_page(value)
+            compacted[key] = value
+        write_cache_file(path, compacted, bounded=name != 'results')
+        logger.info(f"{name}: {len(entries)} -> {len(compacted)} entries, "
+                    f"{before / 1024:.1f} -> {os.path.getsize(path) / 1024:.1f} KiB")
+    
+    # Keep progress consistent with the results it describes
+    progress = read_progress()
+    processed = sorted(set(progress.get('processed_ids', [])), key=str)
+    progress['processed_ids'] = processed
+    progress['timed_out_ids'] = sorted(set(progress.get('timed_out_ids', [])) - set(processed), key=str)
+    write_progress(progress)
+    
+    if os.path.isdir(PAGE_ARCHIVE_DIR):
+        compact_page_archive()
+
+def compact_page_archive():
+    """Keep only the latest index entry per page and delete blobs nothing points at."""
+    latest = {}
+    for entry in read_archive_index():
+        latest[(entry['kind'], entry['key'])] = entry
+    before = directory_size(PAGE_ARCHIVE_DIR)
+    write_archive_index(sorted(latest.values(), key=lambda entry: entry['archived_at']))
+    
+    used = {entry['hash'] for entry in latest.values() if 'hash' in entry}
+    removed = 0
+    for root, _, names in os.walk(os.path.join(PAGE_ARCHIVE_DIR, 'blobs')):
+        for name in names:
+            if name not in used:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    logger.info(f"pages: {len(latest)} index entries kept, {removed} unused blobs removed, "
+                f"{before / 1024:.1f} -> {directory_size(PAGE_ARCHIVE_DIR) / 1024:.1f} KiB")
+
+def cache_export(archive_path):
+    """Pack the cache stores, progress and page archive into one .tar.gz file."""
+    names = [os.path.basename(cache_paths(CACHE_DIR)[name]) for name in CACHE_STORES]
+    names += [os.path.basename(PROGRESS_FILE), os.path.basename(PAGE_ARCHIVE_DIR)]
+    with tarfile.open(archive_path, 'w:gz') as tar:
+        for name in names:
+            path = os.path.join(CACHE_DIR, name)
+            if os.path.exists(path):
+                tar.add(path, arcname=name)
+    logger.info(f"Exported {CACHE_DIR} to {archive_path} ({os.path.getsize(archive_path) / 1024:.1f} KiB)")
+
+def cache_import(archive_path):
+    """Merge an exported cache into this one.
+    
+    Local entries win, except local failures that the import has an answer for.
+    Imported pages are added for keys the local archive does not have.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with tarfile.open(archive_path, 'r:*') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(tmp_dir, filter='data')
+            else:
+                tar.extractall(tmp_dir)
+        imported_paths = cache_paths(tmp_dir)
+        
+        for name in CACHE_STORES:
+            if not os.path.exists(imported_paths[name]):
+                continue
+            entries = read_store(name)
+            added = 0
+            for key, value in read_cache_file(imported_paths[name]).items():
+                if key not in entries or (is_negative(entries[key]) and not is_negative(value)):
+                    entries[key] = value
+                    added += 1
+            write_cache_file(cache_paths(CACHE_DIR)[name], entries, bounded=name != 'results')
+            logger.info(f"{name}: imported {added} entries, {len(entries)} total")
+        
+        if os.path.exists(imported_paths['progress']):
+            with open(imported_paths['progress']) as f:
+                imported = json.load(f)
+            progress = read_progress()
+            processed = set(progress.get('processed_ids', [])) | set(imported.get('processed_ids', []))
+            progress['processed_ids'] = list(processed)
+            progress['timed_out_ids'] = list(set(progress.get('timed_out_ids', [])) - processed)
+            write_progress(progress)
+        
+        imported_pages = imported_paths['pages']
+        if os.path.isdir(imported_pages):
+            import_page_archive(imported_pages)
+
+def import_page_archive(imported_pages):
+    local = {(entry['kind'], entry['key']) for entry in read_archive_index()}
+    with open(os.path.join(imported_pages, 'index.jsonl')) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    new_entries = [entry for entry in entries if (entry['kind'], entry['key']) not in local]
+    
+    for entry in new_entries:
+        if 'hash' in entry and not os.path.exists(page_blob_path(entry['hash'])):
+            source = os.path.join(imported_pages, 'blobs', entry['hash'][:2], entry['hash'])
+            os.makedirs(os.path.dirname(page_blob_path(entry['hash'])), exist_ok=True)
+            shutil.copyfile(source, page_blob_path(entry['hash']))
+    
+    if new_entries:
+        write_archive_index(list(read_archive_index()) + new_entries)
+    logger.info(f"pages: imported {len(new_entries)} archived pages")
+
+def reextract_archive():
+    """Rebuild the page caches by re-parsing every archived page, with no network.
+    
+    Row results that came from Wikipedia or Google, and misses, are dropped so the rows
+    are resolved again from the rebuilt pages.
+    """
+    entries = archived_pages()
+    counts = Counter()
+    start = time.time()
+    progress = ProgressReporter(logger, len(entries), 'Re-extracted pages')
+    
+    # Parsing is the whole job here, so chunks of pages go to the worker processes
+    items = [(kind, key, page_blob_path(entry['hash'])) for (kind, key), entry in entries.items()]
+    for chunk in cpu_map(reparse_pages, chunked(items)):
+        for kind, key, value, error in chunk:
+            if error is None:
+                if kind == 'web':
+                    web_cache[get_cache_key(f"web_page_{key}")] = value
+                elif kind == 'wiki':
+                    wikipedia_cache[get_cache_key(f"wikipedia_page_{key}")] = value
+                counts[kind] += 1
+            else:
+                logger.error(f"Error re-extracting {kind} page {key}: {error}")
+                if kind == 'web':
+                    web_cache[get_cache_key(f"web_page_{key}")] = negative_entry(RuntimeError(error), 'parse_error')
+                counts['errors'] += 1
+        progress.update(len(chunk))
+    progress.close()
+    
+    # Lookups and rows built on the old page caches are stale
+    location_date_cache.clear()
+    stale = [row_id for row_id, result in results_cache.items() if result[1] in ('wikipedia', 'google', None)]
+    for row_id in stale:
+        del results_cache[row_id]
+        processed_ids.discard(row_id)
+    
+    logger.info(f"Re-extracted {counts['web']} web and {counts['wiki']} Wikipedia pages "
+                f"({counts['errors']} errors) in {time.time() - start:.1f}s; {len(stale)} rows to re-resolve")
+
+# Typical seconds a live request takes, on top of its polite delay, for warm-up estimates
+EST_REQUEST_SECONDS = 0.5
+
+# Result pages fetched per Google query
+EST_PAGES_PER_GOOGLE_QUERY = 3
+
+def plan_warm_up(pending):
+    """List the uncached Wikipedia searches and Google queries the pending rows would need."""
+    searches = OrderedDict()
+    queries = OrderedDict()
+    
+    for task in pending:
+        for location in task['locations'][:3]:
+            if query_key('location', location) in location_date_cache:
+                continue
+            for term in wikipedia_search_terms(location, task['cleaned']):
+                key = query_key('wikipedia_search', term)
+                if key not in wikipedia_cache:
+                    searches.setdefault(key, term)
+        
+        # Google is only tried for the primary location
+        primary = task['locations'][0]
+        if query_key('location_google', primary) not in location_date_cache:
+            for query in google_search_queries(primary, task['cleaned']):
+                key = query_key('google_search', query)
+                if key not in search_cache:
+                    queries.setdefault(key, query)
+    
+    return list(searches.values()), list(queries.values())
+
+def estimate_warm_up(searches, titles, queries, warm_google=False):
+    """Estimate requests and seconds per host for a warm-up at the allowed rates.
+    
+    Each host is assumed to run at its starting concurrency limit, with the request's
+    mean polite delay plus EST_REQUEST_SECONDS per request. Google counts are upper
+    bounds, since rows Wikipedia answers never reach Google.
+    """
+    wiki_host = request_host('wikipedia_search', '')
+    plan = [('wikipedia_search', wiki_host, len(searches), 0.35),
+            ('wikipedia_pages', wiki_host, -(-len(titles) // WIKI_TITLES_PER_REQUEST), 0.35)]
+    if warm_google:
+        plan += [('google_search', request_host('google_search', ''), len(queries), 1.5),
+                 ('web_page', 'web pages', len(queries) * EST_PAGES_PER_GOOGLE_QUERY, 1.5)]
+    
+    estimate = {}
+    for kind, host, count, mean_delay in plan:
+        concurrency = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)[0]
+        estimate[kind] = {
+            'host': host,
+            'requests': count,
+            'seconds': round(count * (mean_delay + EST_REQUEST_SECONDS) / concurrency, 1)
+        }
+    return estimate
+
+def warm_up_cache(df, max_workers=4, dry_run=False, warm_google=False):
+    """Prefetch the lookups the extraction pass needs into the caches, ahead of time.
+    
+    Wikipedia searches run first, then the pages behind them in batches. With warm_google,
+    rows Wikipedia cannot answer have their primary location looked up on Google too.
+    Requests go through http_call, so host limits and circuit breakers apply.
+    """
+    unprocessed_df = df[~df['id'].isin(processed_ids)]
+    
+    # Local tiers first, so only rows that need lookups are planned
+    result_rows, pending = run_local_phase(unprocessed_df)
+    searches, queries = plan_warm_up(pending)
+    titles = [title for title in pending_wikipedia_titles(pending)
+              if get_cache_key(f"wikipedia_page_{title}") not in wikipedia_cache]
+    
+    estimate = estimate_warm_up(searches, titles, queries, warm_google)
+    logger.info(f"Warm-up: {len(result_rows)} rows resolved locally, {len(pending)} need lookups")
+    for kind, stats in estimate.items():
+        logger.info(f"Warm-up {kind}: {stats['requests']} requests to {stats['host']}, ~{stats['seconds'] / 60:.1f} min")
+    
+    # Hosts run in parallel, so the slowest one bounds the total
+    slowest = {}
+    for stats in estimate.values():
+        slowest[stats['host']] = slowest.get(stats['host'], 0) + stats['seconds']
+    logger.info(f"Warm-up estimate: {sum(stats['requests'] for stats in estimate.values())} requests, "
+                f"~{max(slowest.values(), default=0) / 60:.1f} min")
+    
+    if dry_run:
+        return estimate
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with metrics.timer('warm_up_wikipedia'):
+                progress = ProgressReporter(logger, len(searches), 'Warm-up Wikipedia searches')
+                for done, _ in enumerate(executor.map(search_wikipedia, searches), 1):
+                    progress.update()
+                    if done % 100 == 0:
+                        save_cache(force=True)
+                progress.close()
+                prefetch_wikipedia_pages(pending_wikipedia_titles(pending))
+            save_cache(force=True)
+            
+            if warm_google:
+                # Only rows whose Wikipedia lookups miss, now answered from cache, reach Google
+                def warm_row(task):
+                    for location in task['locations'][:3]:
+                        if try_wikipedia_for_location(location, task['cleaned'])[0]:
+                            return
+                    try_google_for_location(task['locations'][0], task['cleaned'])
+                
+                with metrics.timer('warm_up_google'):
+                    progress = ProgressReporter(logger, len(pending), 'Warm-up rows checked for Google')
+                    for done, _ in enumerate(executor.map(warm_row, pending), 1):
+                        progress.update()
+                        if done % 50 == 0:
+                            save_cache(force=True)
+                    progress.close()
+    except KeyboardInterrupt:
+        logger.warning("Warm-up interrupted by user. Saving current progress...")
+    
+    save_cache(force=True)
+    logger.info("Warm-up complete")
+    return estimate
+
 # Main function with resumable processing
-def main(input_file, output_file, batch_size=10, max_workers=4, resume=True, reset=False, skip_problematic=False):
-    """Main function with additional options to handle problematic entries."""
+def main(input_file, output_file, batch_size=10, max_workers=4, resume=True, reset=False,
+         shard_index=None, num_shards=1, metrics_file=None, metrics_interval=None, places_file=None,
+         warm_up=False, dry_run=False, warm_google=False, re_extract=False, offline=False, cpu_workers=None):
+    """Main function; rows that run past their deadline are retried rather than stalling the run.
+    
+    With num_shards > 1, only the rows hashed to shard_index are processed, using that
+    shard's own cache directory; run merge_shards afterwards to build the final output.
+    In replay HTTP mode, caches and progress live in a replay/ subdirectory of the cache directory.
+    With warm_up, the caches are filled ahead of an extraction pass and no output is written.
+    With offline, rows are resolved from the persisted caches alone, one after another
+    with no sleeps, and rows that would need a fetch are deferred and reported.
+    With re_extract, page caches are rebuilt from the raw page archive first and rows
+    are re-resolved offline.
+    Parsing runs in cpu_workers processes (default: one per core) fed by the I/O threads.
+    """
+    sharded = num_shards > 1
+    if sharded:
+        set_cache_dir(shard_cache_dir(shard_index, num_shards))
+        logger.info(f"Running shard {shard_index + 1}/{num_shards} with caches in {CACHE_DIR}")
+    
+    # Replay serves recorded responses instead of the network. Its misses and injected
+    # errors must not reach the real caches or mark rows done, so it keeps its own
+    if HTTP_MODE == 'replay':
+        load_http_archive()
+        set_cache_dir(os.path.join(CACHE_DIR, 'replay'))
+        logger.info(f"Replaying with caches and progress in {CACHE_DIR}")
     
     # Check if reset is requested
     if reset:
@@ -1068,12 +3638,13 @@ def main(input_file, output_file, batch_size=10, max_workers=4, resume=True, res
                 os.remove(cache_file)
                 logger.info(f"Reset: Deleted {cache_file}")
         # Reset global caches and processed IDs
-        global wikipedia_cache, search_cache, web_cache, results_cache, processed_ids
-        wikipedia_cache = {}
-        search_cache = {}
-        web_cache = {}
+        global wikipedia_cache, search_cache, web_cache, results_cache, processed_ids, timed_out_ids
+        wikipedia_cache = new_cache()
+        search_cache = new_cache()
+        web_cache = new_cache()
         results_cache = {}
         processed_ids = set()
+        timed_out_ids = set()
     
     logger.info(f"Starting optimized date extraction process for {input_file}")
     
@@ -1081,6 +3652,12 @@ def main(input_file, output_file, batch_size=10, max_workers=4, resume=True, res
     if resume and not reset:
         load_cache()
     
+    # Offline and re-extract runs only read the caches and the page archive
+    if offline or re_extract:
+        global NETWORK_ENABLED
+        NETWORK_ENABLED = False
+        logger.info("Network disabled: resolving rows from the caches only")
+    
     # Load the data
     df = pd.read_csv(input_file)
     logger.info(f"Loaded {len(df)} entries from {input_file}")
@@ -1091,79 +3668,161 @@ def main(input_file, output_file, batch_size=10, max_workers=4, resume=True, res
     # Prepare the dataset
     df = prepare_dataset(df)
     
-    # Get unprocessed rows to identify potential problem entries
-    unprocessed_df = df[~df['id'].isin(processed_ids)]
-    unprocessed_ids = unprocessed_df['id'].tolist()
+    # Build the gazetteer from every row, before sharding
+    set_gazetteer(df, places_file)
     
-    logger.info(f"Remaining unprocessed IDs: {unprocessed_ids}")
+    # Keep only this shard's rows
+    if sharded:
+        df = df[df['id'].map(lambda row_id: shard_of(row_id, num_shards)) == shard_index]
+        logger.info(f"Shard {shard_index + 1}/{num_shards} holds {len(df)} entries")
     
-    # If requested, mark problematic entries as processed to skip them
-    if skip_problematic and len(unprocessed_ids) < 50:  # applying to small numbers of stuck entries
-        for problem_id in unprocessed_ids:
-            logger.warning(f"Marking problematic ID {problem_id} as processed with default values")
-            processed_ids.add(problem_id)
-            results_cache[problem_id] = ('2025/01/01', 'skipped', 'low')
-        
-        # Save progress after skipping
-        save_cache(force=True)
-        logger.info("Problematic entries marked as skipped")
-        
-        # Exit early if we've skipped all remaining entries
-        if df[~df['id'].isin(processed_ids)].empty:
-            # Process results and save
-            result_df = create_result_df(df)
-            result_df = post_process_results(result_df)
-            result_df.to_csv(output_file, index=False)
-            logger.info(f"Results saved to {output_file}")
-            
-            # Create merged dataset with dates added to original data
-            merged_df = merge_with_original(original_df, result_df)
-            merged_output = f"{os.path.splitext(output_file)[0]}_evidence_date.csv"
-            merged_df.to_csv(merged_output, index=False)
-            logger.info(f"Merged dataset saved to {merged_output}")
-            
-            return result_df
+    # Workers start after the gazetteer is built, since the local tiers need it
+    start_cpu_pool(CPU_WORKERS if cpu_workers is None else cpu_workers)
+    
+    # Warm-up only fills the caches
+    if warm_up:
+        try:
+            return warm_up_cache(df, max_workers, dry_run=dry_run, warm_google=warm_google)
+        finally:
+            stop_cpu_pool()
+    
+    if re_extract:
+        reextract_archive()
+    
+    # Rows the old manual skip marked with a placeholder date get a real retry instead
+    skipped_ids = [row_id for row_id, result in results_cache.items() if result[1] == 'skipped']
+    for row_id in skipped_ids:
+        del results_cache[row_id]
+        processed_ids.discard(row_id)
+        timed_out_ids.add(row_id)
+    if skipped_ids:
+        logger.info(f"Queued {len(skipped_ids)} previously skipped IDs for the retry pass")
+    
+    unprocessed_count = (~df['id'].isin(processed_ids)).sum()
+    logger.info(f"Remaining unprocessed IDs: {unprocessed_count}, {len(timed_out_ids)} of them timed out before")
     
     # Record start time
     start_time = time.time()
     
-    # Process the DataFrame with optimized parallel processing
-    result_df = process_dataframe_parallel(df, batch_size=batch_size, max_workers=max_workers)
+    # Write run metrics periodically while processing
+    global metrics
+    metrics = RunMetrics()
+    metrics_file = metrics_file or os.path.join(CACHE_DIR, 'metrics.json')
+    start_metrics_writer(metrics_file, metrics_interval)
     
-    # Post-process results
-    result_df = post_process_results(result_df)
+    # Process the DataFrame with optimized parallel processing
+    try:
+        result_df = process_dataframe_parallel(df, batch_size=batch_size, max_workers=max_workers)
+    finally:
+        stop_cpu_pool()
+        stop_metrics_writer(metrics_file)
     
     # Record end time and log duration
     end_time = time.time()
     duration = end_time - start_time
     logger.info(f"Processing completed in {duration:.2f} seconds ({duration/60:.2f} minutes)")
     
-    # Save results
-    result_df.to_csv(output_file, index=False)
-    logger.info(f"Results saved to {output_file}")
+    # Shards only save their own raw results; merge_shards builds the final output
+    if sharded:
+        shard_output = shard_output_file(output_file, shard_index, num_shards)
+        result_df.to_csv(shard_output, index=False)
+        logger.info(f"Shard results saved to {shard_output}")
+        return result_df
     
-    # Create merged dataset with dates added to original data
-    merged_df = merge_with_original(original_df, result_df)
-    merged_output = f"{os.path.splitext(output_file)[0]}.csv"
-    merged_df.to_csv(merged_output, index=False)
-    logger.info(f"Merged dataset saved to {merged_output}")
+    # Post-process results
+    result_df = post_process_results(result_df)
     
-    # Save a timestamp-versioned backup
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    backup_file = f"{output_file.rsplit('.', 1)[0]}_{timestamp}.csv"
-    result_df.to_csv(backup_file, index=False)
-    logger.info(f"Backup saved to {backup_file}")
+    save_outputs(original_df, result_df, output_file)
     
     return result_df
 
 if __name__ == "__main__":
-    # Configuration
-    input_file = '../Datasets/haunted_places.csv'
-    output_file = '../Datasets/haunted_places_evidence_date.csv'
-    
+    parser = argparse.ArgumentParser(description="Determine evidence dates for haunted places.")
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'warm-up', 're-extract', 'merge-shards'] + CACHE_COMMANDS,
+                        help="'run' processes rows (optionally one shard), 'warm-up' prefetches lookups into the caches, "
+                             "'re-extract' re-parses archived pages with no network, 'merge-shards' combines shard results; "
+                             "the cache-* commands inspect and manage the cache directory (of one shard with --shard)")
+    parser.add_argument('--input', default='../Datasets/haunted_places.csv')
+    parser.add_argument('--output', default='../Datasets/haunted_places_evidence_date.csv')
     # Optimize parameters (reduce if running out of memory)
-    batch_size = 20  
-    max_workers = 10 
-    
-    # set reset to True if you want to start from scratch and clear caches
-    main(input_file, output_file, batch_size, max_workers, resume=True, reset=False, skip_problematic=True)
\ No newline at end of file
+    parser.add_argument('--batch-size', type=int, default=20, help="caches are saved every ten batches of rows")
+    parser.add_argument('--max-workers', type=int, default=10)
+    # set reset if you want to start from scratch and clear caches
+    parser.add_argument('--reset', action='store_true', help="start from scratch and clear caches")
+    parser.add_argument('--shard', type=int, default=0, help="index of this shard, from 0")
+    parser.add_argument('--num-shards', type=int, default=1, help="total number of shards")
+    parser.add_argument('--http-mode', default='live', choices=['live', 'record', 'replay'],
+                        help="'record' archives every response, 'replay' serves them with no network "
+                             "using separate caches in cache/replay")
+    parser.add_argument('--replay-latency', type=float, help="mean seconds per replayed request")
+    parser.add_argument('--replay-jitter', type=float, help="latency spread as a fraction of the mean")
+    parser.add_argument('--replay-error-rate', type=float, help="chance a replayed request fails")
+    parser.add_argument('--replay-seed', type=int)
+    parser.add_argument('--wikipedia-api-url', default=WIKIPEDIA_API_URL,
+                        help="MediaWiki API endpoint, e.g. a local stand-in for testing")
+    parser.add_argument('--places-file', help="extra place names for the gazetteer, one per line")
+    parser.add_argument('--aliases-file', help="tab-separated 'alias<TAB>name' lines of places that are the same")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="with warm-up, only estimate the requests and time; with cache-purge, only count matches")
+    parser.add_argument('--warm-google', action='store_true', help="with warm-up, also prefetch Google lookups")
+    parser.add_argument('--metrics-file', help="metrics output, JSON or Prometheus text for .prom (default: cache/metrics.json)")
+    parser.add_argument('--metrics-interval', type=float, help="seconds between metrics file writes")
+    parser.add_argument('--log-level', default='INFO', help="DEBUG shows every per-row message")
+    parser.add_argument('--log-sample', type=float, default=0.0, help="fraction of per-row messages to show at INFO")
+    parser.add_argument('--hedge', action='store_true', help="start Google alongside slow Wikipedia lookups")
+    parser.add_argument('--hedge-percentile', type=float, default=HEDGE_PERCENTILE,
+                        help="Wikipedia latency percentile after which the Google lookup starts")
+    parser.add_argument('--source', nargs='+', choices=CACHE_STORES + ['pages'],
+                        help="with cache-purge, the stores to purge (default: all)")
+    parser.add_argument('--older-than', type=float, help="with cache-purge, days since an entry was written")
+    parser.add_argument('--key-pattern', help="with cache-purge, regex matched against keys, titles, URLs and messages")
+    parser.add_argument('--failure', choices=sorted(NEGATIVE_CACHE_TTL),
+                        help="with cache-purge, only failures of this class")
+    parser.add_argument('--archive', help="with cache-export/cache-import, the .tar.gz file to write or read")
+    parser.add_argument('--cpu-workers', type=int, default=CPU_WORKERS,
+                        help="processes for parsing and date extraction, 0 to parse on the I/O threads")
+    parser.add_argument('--offline', action='store_true',
+                        help="resolve rows from the caches only and report the rows that would need a fetch")
+    parser.add_argument('--row-deadline', type=float, default=ROW_DEADLINE,
+                        help="seconds a row may spend on lookups before it is cancelled and queued for retry")
+    args = parser.parse_args()
+    
+    if not 0 <= args.shard < args.num_shards:
+        parser.error("--shard must be between 0 and --num-shards - 1")
+    
+    setup_logging(args.log_level, row_sample_rate=args.log_sample)
+    ROW_DEADLINE = args.row_deadline
+    HEDGE_ENABLED, HEDGE_PERCENTILE = args.hedge, args.hedge_percentile
+    configure_http(args.http_mode, args.replay_latency, args.replay_jitter, args.replay_error_rate, args.replay_seed)
+    if args.aliases_file:
+        load_location_aliases(args.aliases_file)
+    if args.wikipedia_api_url != WIKIPEDIA_API_URL:
+        configure_wikipedia(args.wikipedia_api_url)
+    
+    if args.command == 'merge-shards':
+        merge_shards(args.input, args.output, args.num_shards)
+    elif args.command in CACHE_COMMANDS:
+        if args.num_shards > 1:
+            set_cache_dir(shard_cache_dir(args.shard, args.num_shards))
+        if args.command in ('cache-export', 'cache-import') and not args.archive:
+            parser.error(f"{args.command} needs --archive")
+        if args.command == 'cache-purge' and not (args.source or args.older_than is not None
+                                                  or args.key_pattern or args.failure):
+            parser.error("cache-purge needs --source, --older-than, --key-pattern or --failure")
+        
+        if args.command == 'cache-info':
+            cache_info()
+        elif args.command == 'cache-purge':
+            cache_purge(args.source, args.older_than, args.key_pattern, args.failure, dry_run=args.dry_run)
+        elif args.command == 'cache-compact':
+            cache_compact()
+        elif args.command == 'cache-export':
+            cache_export(args.archive)
+        else:
+            cache_import(args.archive)
+    else:
+        main(args.input, args.output, args.batch_size, args.max_workers, resume=True, reset=args.reset,
+             shard_index=args.shard, num_shards=args.num_shards,
+             metrics_file=args.metrics_file, metrics_interval=args.metrics_interval, places_file=args.places_file,
+             warm_up=args.command == 'warm-up', dry_run=args.dry_run, warm_google=args.warm_google,
+             re_extract=args.command == 're-extract', offline=args.offline, cpu_workers=args.cpu_workers)
@@ -6,6 +6,11 @@ import dateparser
 import spacy
 import wikipedia
 import time
+import logging
+from pipeline_logging import setup_logging, log_row, ProgressReporter
+
+setup_logging(logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Load the spacy model
 nlp = spacy.load("en_core_web_sm")
@@ -250,7 +255,7 @@ def extract_date(description):
                     if search_term in wikipedia_cache:
                         page_content = wikipedia_cache[search_term]
                     else:
-                        print(f"Trying Wikipedia search term: {search_term}")
+                        log_row(logger, "Trying Wikipedia search term: %s", search_term)
                         page = wikipedia.page(search_term, auto_suggest=True)
                         page_content = page.content
                         wikipedia_cache[search_term] = page_content  # Store in cache
@@ -262,12 +267,12 @@ def extract_date(description):
                         # Filter for historical dates
                         best_date = filter_historical_dates(wiki_dates)
                         if best_date:
-                            print(f"Wikipedia date found: {best_date}")
+                            log_row(logger, "Wikipedia date found: %s", best_date)
                             wikipedia_used = True
                             return best_date.strftime('%Y/%m/%d'), wikipedia_used
                             
                 except wikipedia.exceptions.DisambiguationError as e:
-                    print(f"Disambiguation error for {search_term}: {e}")
+                    log_row(logger, "Disambiguation error for %s: %s", search_term, e)
                     try:
                         # Try the first option that contains the original search term
                         options = [opt for opt in e.options if search_term.lower() in opt.lower()]
@@ -277,18 +282,18 @@ def extract_date(description):
                             if wiki_dates:
                                 best_date = filter_historical_dates(wiki_dates)
                                 if best_date:
-                                    print(f"Wikipedia date found from disambiguation: {best_date}")
+                                    log_row(logger, "Wikipedia date found from disambiguation: %s", best_date)
                                     wikipedia_used = True
                                     return best_date.strftime('%Y/%m/%d'), wikipedia_used
                     except:
                         continue
                 
                 except wikipedia.exceptions.PageError:
-                    print(f"Page not found for {search_term}")
+                    log_row(logger, "Page not found for %s", search_term)
                     continue
                     
                 except Exception as e:
-                    print(f"Error during Wikipedia lookup: {e}")
+                    logger.error("Error during Wikipedia lookup: %s", e)
                     continue
                 
                 # Add delay to avoid rate limiting
@@ -317,6 +322,7 @@ def determine_haunted_date(df):
     wikipedia_date_count = 0
 
     # Limit to the first 12000 rows
+    progress = ProgressReporter(logger, min(len(df), 12000), 'Rows dated')
     for i, description in enumerate(df['description']):
         if i >= 12000:
             break
@@ -329,12 +335,14 @@ def determine_haunted_date(df):
         else:
             dates.append('2025/01/01')
             default_date_count += 1
+        progress.update(found=int(bool(date_found)), wikipedia=int(bool(date_found and wikipedia_used)))
+    progress.close()
 
     df['haunted_places_date'] = dates
 
-    print(f"Number of default dates set: {default_date_count}")
-    print(f"Number of dates correctly found: {correct_date_count}")
-    print(f"Number of dates found using Wikipedia: {wikipedia_date_count}")
+    logger.info(f"Number of default dates set: {default_date_count}")
+    logger.info(f"Number of dates correctly found: {correct_date_count}")
+    logger.info(f"Number of dates found using Wikipedia: {wikipedia_date_count}")
     return df
 
 if __name__ == "__main__":
@@ -343,4 +351,4 @@ if __name__ == "__main__":
     df_with_dates = determine_haunted_date(df)
     output_file_path = '../Datasets/haunted_places_dates_wiki_2500.tsv'
     df_with_dates.to_csv(output_file_path, sep='\t', index=False)
-    print(f"DataFrame with dates saved to: {output_file_path}")
\ No newline at end of file
+    logger.info(f"DataFrame with dates saved to: {output_file_path}")
\ No newline at end of file
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from solar import load_daylight_table
 
 ###############################################################################
 # State Name Normalization
@@ -185,6 +186,11 @@ def load_and_aggregate_haunted(filepath: str) -> pd.DataFrame:
     
     df['haunted_places_witness_count'] = pd.to_numeric(df.get('haunted_places_witness_count'), errors='coerce')
     df['average_daylight_hours'] = pd.to_numeric(df.get('average_daylight_hours'), errors='coerce')
+    # Rows with coordinates take their annual average from the daylight table
+    if 'latitude' in df.columns and 'longitude' in df.columns:
+        annual = load_daylight_table().annual(pd.to_numeric(df['latitude'], errors='coerce'),
+                                              pd.to_numeric(df['longitude'], errors='coerce'))
+        df['average_daylight_hours'] = pd.Series(annual, index=df.index).fillna(df['average_daylight_hours'])
     
     group_cols = ['state', 'year']
     grouped = df.groupby(group_cols, dropna=True).agg({
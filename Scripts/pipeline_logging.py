@@ -0,0 +1,121 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+# Shared logging setup for the scripts. Records go onto a queue and a background
+# listener thread formats and writes them, so workers never block on terminal I/O.
+# Per-row messages go through log_row: they are DEBUG unless sampled, and are only
+# formatted when they will actually be written. ProgressReporter replaces per-row
+# lines with one aggregate line every few seconds.
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Seconds between aggregate progress lines
+PROGRESS_INTERVAL = 10
+
+# Fraction of per-row messages promoted to INFO, 0 to keep them all at DEBUG
+ROW_SAMPLE_RATE = 0.0
+
+listener = None
+
+def setup_logging(level=logging.INFO, log_file=None, row_sample_rate=None):
+    """Route all logging through a queue drained by one background listener thread.
+
+    Safe to call more than once; later calls replace the handlers and listener.
+    """
+    global listener, ROW_SAMPLE_RATE
+
+    if row_sample_rate is not None:
+        ROW_SAMPLE_RATE = row_sample_rate
+    if isinstance(level, str):
+        level = getattr(logging, level.upper())
+
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return root
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global listener
+
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+atexit.register(stop_logging)
+
+def log_row(logger, message, *args):
+    """Log a per-row message at DEBUG, or at INFO for a ROW_SAMPLE_RATE sample of rows.
+
+    Use %-style args, so messages that are filtered out are never formatted.
+    """
+    if ROW_SAMPLE_RATE and random.random() < ROW_SAMPLE_RATE:
+        logger.info(message, *args)
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
+
+class ProgressReporter:
+    """Thread-safe progress counter that logs one aggregate line every interval seconds."""
+
+    def __init__(self, logger, total, label='Progress', interval=None):
+        self.logger = logger
+        self.total = total
+        self.label = label
+        self.interval = interval or PROGRESS_INTERVAL
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+        self._last_report = self.start_time
+        self.done = 0
+        self.counts = {}
+
+    def update(self, n=1, **counts):
+        """Count n finished items, plus any named outcome counts."""
+        with self._lock:
+            self.done += n
+            for name, value in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+            now = time.time()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            line = self._line(now)
+        self.logger.info(line)
+
+    def close(self):
+        """Log the final totals."""
+        with self._lock:
+            line = self._line(time.time())
+        self.logger.info(line)
+
+    def _line(self, now):
+        elapsed = max(now - self.start_time, 1e-9)
+        rate = self.done / elapsed
+        line = f"{self.label}: {self.done}/{self.total}"
+        if self.total:
+            line += f" ({self.done / self.total * 100:.1f}%)"
+        line += f", {rate:.2f}/s"
+        if self.total and rate > 0 and self.done < self.total:
+            line += f", ~{(self.total - self.done) / rate / 60:.1f} min left"
+        if self.counts:
+            line += ', ' + ', '.join(f"{name}={value}" for name, value in sorted(self.counts.items()))
+        return line
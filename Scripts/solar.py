@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import numpy as np
+
+# Sunrise, sunset and daylight length from the NOAA solar position equations
+# (the NOAA Solar Calculator spreadsheet), vectorized with NumPy so a whole
+# dataset is computed in one pass, offline. Agrees with USNO to within a minute
+# or two at the latitudes in the dataset.
+#
+# DaylightTable precomputes a year of daylight on a lat/lon grid into a memory-mapped
+# .npy file, so annual, seasonal and per-date values are array lookups.
+
+logger = logging.getLogger(__name__)
+
+# Sun's altitude at sunrise and sunset: refraction plus the solar disc radius
+SUNRISE_ZENITH = 90.833
+
+def to_days(dates):
+    """Dates (datetimes, strings or datetime64) as a datetime64[D] array."""
+    return np.asarray(dates, dtype='datetime64[D]')
+
+def julian_century(days, longitudes):
+    """Julian centuries since J2000 at each place's local solar noon."""
+    unix_days = (days - np.datetime64('1970-01-01', 'D')).astype(np.float64)
+    julian_day = unix_days + 2440587.5 + 0.5 - longitudes / 360.0
+    return (julian_day - 2451545.0) / 36525.0
+
+def solar_position(t):
+    """Solar declination (degrees) and equation of time (minutes) at julian century t."""
+    mean_longitude = np.mod(280.46646 + t * (36000.76983 + t * 0.0003032), 360.0)
+    mean_anomaly = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+    center = (np.sin(mean_anomaly) * (1.914602 - t * (0.004817 + 0.000014 * t))
+              + np.sin(2 * mean_anomaly) * (0.019993 - 0.000101 * t)
+              + np.sin(3 * mean_anomaly) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_longitude = np.radians(mean_longitude + center - 0.00569 - 0.00478 * np.sin(omega))
+
+    mean_obliquity = 23.0 + (26.0 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60.0) / 60.0
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+    declination = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude)))
+
+    y = np.tan(obliquity / 2) ** 2
+    l0 = np.radians(mean_longitude)
+    equation_of_time = 4 * np.degrees(
+        y * np.sin(2 * l0)
+        - 2 * eccentricity * np.sin(mean_anomaly)
+        + 4 * eccentricity * y * np.sin(mean_anomaly) * np.cos(2 * l0)
+        - 0.5 * y * y * np.sin(4 * l0)
+        - 1.25 * eccentricity * eccentricity * np.sin(2 * mean_anomaly))
+    return declination, equation_of_time
+
+def sunrise_hour_angle(latitudes, declination):
+    """Hour angle of sunrise in degrees; 0 in polar night and 180 in midnight sun."""
+    lat = np.radians(latitudes)
+    dec = np.radians(declination)
+    cos_angle = np.cos(np.radians(SUNRISE_ZENITH)) / (np.cos(lat) * np.cos(dec)) - np.tan(lat) * np.tan(dec)
+    return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+def sun_times(latitudes, longitudes, dates):
+    """Sunrise and sunset in minutes after 00:00 UTC of each date, and daylight hours.
+
+    Arguments broadcast against each other, so one date can be given for many places.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    declination, equation_of_time = solar_position(julian_century(to_days(dates), longitudes))
+    hour_angle = sunrise_hour_angle(latitudes, declination)
+
+    solar_noon = 720.0 - 4.0 * longitudes - equation_of_time
+    sunrise = solar_noon - 4.0 * hour_angle
+    sunset = solar_noon + 4.0 * hour_angle
+    return sunrise, sunset, 8.0 * hour_angle / 60.0
+
+def daylight_hours(latitudes, longitudes, dates):
+    """Hours from sunrise to sunset for each place and date."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    declination, _ = solar_position(julian_century(to_days(dates), np.asarray(longitudes, dtype=np.float64)))
+    return 8.0 * sunrise_hour_angle(latitudes, declination) / 60.0
+
+# Daylight table grid. Daylight depends on latitude; longitude only shifts when local
+# noon falls, worth well under a minute, so its axis can be coarse.
+TABLE_LAT_STEP = 0.25
+TABLE_LON_STEP = 30.0
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'daylight_table.npy')
+
+# A leap year, so every calendar day has a slot
+TABLE_YEAR = 2024
+TABLE_DAYS = 366
+
+# Slots after the 366 days hold the annual mean and the seasonal means
+ANNUAL_SLOT = TABLE_DAYS
+SEASONS = {'winter': (12, 1, 2), 'spring': (3, 4, 5), 'summer': (6, 7, 8), 'autumn': (9, 10, 11)}
+SEASON_SLOTS = {season: ANNUAL_SLOT + 1 + i for i, season in enumerate(SEASONS)}
+
+def table_meta_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def build_daylight_table(path=None, lat_step=None, lon_step=None):
+    """Compute daylight hours for every day of TABLE_YEAR on a lat/lon grid and save it.
+
+    The table is float32 of shape (latitudes, longitudes, 366 days + annual + 4 seasons),
+    written as a .npy file with the grid described in a .json file beside it.
+    """
+    path = path or TABLE_FILE
+    lat_step = lat_step or TABLE_LAT_STEP
+    lon_step = lon_step or TABLE_LON_STEP
+    latitudes = np.arange(-90.0, 90.0 + lat_step / 2, lat_step)
+    longitudes = np.arange(-180.0, 180.0 + lon_step / 2, lon_step)
+    days = np.arange(f'{TABLE_YEAR}-01-01', f'{TABLE_YEAR + 1}-01-01', dtype='datetime64[D]')
+    months = days.astype('datetime64[M]').astype(int) % 12 + 1
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    slots = TABLE_DAYS + 1 + len(SEASONS)
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                      shape=(len(latitudes), len(longitudes), slots))
+    for j, longitude in enumerate(longitudes):
+        table[:, j, :TABLE_DAYS] = daylight_hours(latitudes[:, None], longitude, days[None, :])
+    daily = table[:, :, :TABLE_DAYS]
+    table[:, :, ANNUAL_SLOT] = daily.mean(axis=2)
+    for season, season_months in SEASONS.items():
+        table[:, :, SEASON_SLOTS[season]] = daily[:, :, np.isin(months, season_months)].mean(axis=2)
+    table.flush()
+    del table, daily
+    os.replace(tmp_path, path)
+
+    with open(table_meta_path(path), 'w') as f:
+        json.dump({'lat_start': -90.0, 'lat_step': lat_step, 'lon_start': -180.0, 'lon_step': lon_step,
+                   'year': TABLE_YEAR}, f)
+    logger.info("Built daylight table %s (%d x %d cells)", path, len(latitudes), len(longitudes))
+    return path
+
+class DaylightTable:
+    """Memory-mapped daylight table; every lookup is a vectorized index into it.
+
+    Values are interpolated between the two nearest latitudes and taken from the
+    nearest longitude. Missing coordinates give NaN.
+    """
+
+    def __init__(self, path=None):
+        path = path or TABLE_FILE
+        if not (os.path.exists(path) and os.path.exists(table_meta_path(path))):
+            build_daylight_table(path)
+        with open(table_meta_path(path)) as f:
+            self.meta = json.load(f)
+        self.table = np.load(path, mmap_mode='r')
+
+    def _lookup(self, latitudes, longitudes, slots):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+
+        lat_position = (np.where(valid, latitudes, 0) - self.meta['lat_start']) / self.meta['lat_step']
+        lat_position = np.clip(lat_position, 0, self.table.shape[0] - 1)
+        lower = np.minimum(lat_position.astype(np.intp), self.table.shape[0] - 2)
+        weight = lat_position - lower
+        lon_index = np.rint((np.where(valid, longitudes, 0) - self.meta['lon_start']) / self.meta['lon_step'])
+        lon_index = np.clip(lon_index, 0, self.table.shape[1] - 1).astype(np.intp)
+
+        hours = ((1 - weight) * self.table[lower, lon_index, slots]
+                 + weight * self.table[lower + 1, lon_index, slots])
+        return np.where(valid, hours, np.nan)
+
+    def annual(self, latitudes, longitudes):
+        """Mean daylight hours over the year."""
+        return self._lookup(latitudes, longitudes, ANNUAL_SLOT)
+
+    def seasonal(self, latitudes, longitudes, season):
+        """Mean daylight hours over a meteorological season: winter, spring, summer or autumn."""
+        return self._lookup(latitudes, longitudes, SEASON_SLOTS[season])
+
+    def on_dates(self, latitudes, longitudes, dates):
+        """Daylight hours on each date, of any year, by its calendar day."""
+        days = to_days(dates)
+        day_of_year = (days - days.astype('datetime64[Y]')).astype(np.intp)
+        years = days.astype('datetime64[Y]').astype(int) + 1970
+        leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+        # Outside leap years, 1 March onwards sits one slot later in the leap-year table
+        slots = day_of_year + ((~leap) & (day_of_year >= 59))
+        return self._lookup(latitudes, longitudes, slots)
+
+daylight_table = None
+
+def load_daylight_table(path=None):
+    """The shared daylight table, building it on first use."""
+    global daylight_table
+    if daylight_table is None or path:
+        daylight_table = DaylightTable(path)
+    return daylight_table
+
+if __name__ == "__main__":
+    from pipeline_logging import setup_logging
+
+    setup_logging(logging.INFO)
+    build_daylight_table()